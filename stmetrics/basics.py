@@ -1,5 +1,6 @@
 import numpy
-from .utils import fixseries, truncate
+from numba import njit, prange
+from .utils import prepare, truncate
 
 
 def ts_basics(timeseries, funcs=["all"], nodata=-9999):
@@ -37,7 +38,7 @@ def ts_basics(timeseries, funcs=["all"], nodata=-9999):
         - "TQR" - Third quaritle of the time series.
 
     :param timeseries: Time series.
-    :type timeseries: numpy.ndarray
+    :type timeseries: numpy.ndarray or PreparedSeries
 
     :param nodata: nodata of the time series. Default is -9999.
     :type nodata: real number
@@ -49,6 +50,9 @@ def ts_basics(timeseries, funcs=["all"], nodata=-9999):
 
     metrics_count = 15
 
+    # prepare time series once for all metrics
+    timeseries = prepare(timeseries, nodata)
+
     if "all" in funcs:
         funcs = [
                 'max_ts',
@@ -70,13 +74,652 @@ def ts_basics(timeseries, funcs=["all"], nodata=-9999):
 
     for f in funcs:
         try:
-            out_metrics[f] = eval(f)(timeseries, nodata)
+            out_metrics[f] = METRICS[f][0](timeseries, nodata)
         except:
             out_metrics[f] = numpy.nan
 
     return out_metrics
 
 
+def ts_basics_batch(matrix, funcs=["all"], nodata=-9999, dtype="float64"):
+    """This function computes the basic metrics for every time series \
+    of a matrix in a single call, using vectorized numpy operations \
+    instead of one call per time series.
+
+    The values produced are the same of ``ts_basics``. Time series that \
+    are rejected by ``check_input`` receive NaN for all metrics.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param funcs: List of basic metrics to be computed. Default is all.
+    :type funcs: list
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: real number
+
+    :param dtype: Floating point type used in the computation and in \
+    the output. Default is float64.
+    :type dtype: string
+
+    :returns: Numpy array of metrics (metrics x pixels), following the \
+    order of ``funcs``.
+    """
+    import warnings
+    from .utils import fixseries_batch, check_input_batch, truncate_array, \
+        error_basics
+
+    if "all" in funcs:
+        funcs = list(error_basics().keys())
+
+    valid = check_input_batch(matrix)
+    ts = fixseries_batch(matrix, nodata, dtype)
+    ts[~valid] = numpy.nan
+
+    count = numpy.sum(~numpy.isnan(ts), axis=1)
+
+    out_metrics = numpy.full((len(funcs), ts.shape[0]), numpy.nan,
+                             dtype=dtype)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        # Shared intermediates, computed only when required
+        stats = dict()
+        if {'max_ts', 'amplitude_ts'} & set(funcs):
+            stats['max'] = numpy.nanmax(ts, axis=1)
+        if {'min_ts', 'amplitude_ts'} & set(funcs):
+            stats['min'] = numpy.nanmin(ts, axis=1)
+        if {'fslope_ts', 'amd_ts'} & set(funcs):
+            stats['diff'] = numpy.abs(numpy.diff(ts, axis=1))
+        if {'iqr_ts', 'fqr_ts', 'sqr_ts', 'tqr_ts', 'skew_ts'} & set(funcs):
+            stats.update(_batch_order_stats(ts, count, valid))
+
+        for i, f in enumerate(funcs):
+            if f == 'max_ts':
+                values = stats['max']
+            elif f == 'min_ts':
+                values = stats['min']
+            elif f == 'mean_ts':
+                values = numpy.nanmean(ts, axis=1)
+            elif f == 'std_ts':
+                values = numpy.nanstd(ts, axis=1)
+            elif f == 'sum_ts':
+                values = numpy.where(valid, numpy.nansum(ts, axis=1),
+                                     numpy.nan)
+            elif f == 'abs_sum_ts':
+                values = numpy.where(valid,
+                                     numpy.nansum(numpy.abs(ts), axis=1),
+                                     numpy.nan)
+            elif f == 'amplitude_ts':
+                values = stats['max'] - stats['min']
+            elif f == 'mse_ts':
+                # Parseval's theorem: the mean of the squared magnitude \
+                # of the fft is the sum of the squared values
+                values = numpy.where(count > 0,
+                                     numpy.nansum(numpy.square(ts), axis=1),
+                                     numpy.nan)
+            elif f == 'fslope_ts':
+                values = numpy.nanmax(stats['diff'], axis=1)
+            elif f == 'amd_ts':
+                values = numpy.nanmean(stats['diff'], axis=1)
+            elif f in stats:
+                values = stats[f]
+            else:
+                raise ValueError("Unknown basic metric: " + str(f))
+
+            out_metrics[i] = truncate_array(values)
+
+    return out_metrics
+
+
+def _batch_order_stats(ts, count, valid):
+    # Quartiles and skewness of every row. Rows are grouped by their \
+    # number of valid values, so that each group is a dense block that can \
+    # be handled by numpy and scipy exactly like a single time series.
+    from scipy import stats
+
+    out = {name: numpy.full(ts.shape[0], numpy.nan)
+           for name in ['iqr_ts', 'fqr_ts', 'sqr_ts', 'tqr_ts', 'skew_ts']}
+
+    for n in numpy.unique(count[valid & (count > 0)]):
+        rows = numpy.where(valid & (count == n))[0]
+        block = ts[rows, :n]
+
+        mid = numpy.percentile(block, [25, 75], axis=1,
+                               interpolation='midpoint')
+        lin = numpy.percentile(block, [25, 50, 75], axis=1,
+                               interpolation='linear')
+
+        out['fqr_ts'][rows] = mid[0]
+        out['tqr_ts'][rows] = mid[1]
+        out['sqr_ts'][rows] = lin[1]
+        out['iqr_ts'][rows] = lin[2] - lin[0]
+        out['skew_ts'][rows] = stats.skew(block, axis=1)
+
+    return out
+
+
+# Metrics computed from cumulative sums in ts_basics_windows
+WINDOW_METRICS = ['mean_ts', 'sum_ts', 'mse_ts', 'abs_sum_ts']
+
+
+def ts_basics_windows(matrix, windows, funcs=WINDOW_METRICS, nodata=-9999,
+                      dtype="float64"):
+    """This function computes the additive basic metrics of many windows \
+    of every time series of a matrix, from cumulative sums built in a \
+    single pass over the time series.
+
+    Each window is handled as a time series of its own, so the values are \
+    the same of ``ts_basics`` over the slice of the window, up to the \
+    floating point error of the cumulative sums. The spikes removed by \
+    ``fixseries`` only depend on the neighbours of each value, so they are \
+    found once, and the first and last values of each window, that can not \
+    be spikes, are corrected.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param windows: List of windows, as (start, end) positions of the \
+    time series. The end is not included.
+    :type windows: list
+
+    :param funcs: List of metrics to be computed, among mean_ts, sum_ts, \
+    mse_ts and abs_sum_ts. Default is all of them.
+    :type funcs: list
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: real number
+
+    :param dtype: Floating point type of the output. Default is float64.
+    :type dtype: string
+
+    :returns: Numpy array of metrics (windows x metrics x pixels), \
+    following the order of ``funcs``.
+    """
+    from .utils import check_input_batch, truncate_array
+
+    for f in funcs:
+        if f not in WINDOW_METRICS:
+            raise ValueError("Metric not available in windows: " + str(f))
+
+    raw = numpy.array(matrix, ndmin=2, copy=False)
+    matrix = raw.astype(float)
+
+    # Remove nodata, as fixseries zeros are kept when nodata is 0
+    if nodata != 0:
+        matrix[matrix == nodata] = numpy.nan
+
+    pixels, length = matrix.shape
+    valid = ~numpy.isnan(matrix)
+    idx = numpy.arange(length)
+    rows = numpy.arange(pixels)[:, None]
+
+    # Position of the last valid value up to each date and of the first \
+    # valid value from each date. Positions -1 and length point to NaN.
+    last = numpy.maximum.accumulate(numpy.where(valid, idx, -1), axis=1)
+    first = numpy.minimum.accumulate(
+        numpy.where(valid, idx, length)[:, ::-1], axis=1)[:, ::-1]
+    before = numpy.hstack([numpy.full((pixels, 1), -1), last[:, :-1]])
+    after = numpy.hstack([first[:, 1:], numpy.full((pixels, 1), length)])
+
+    padded = numpy.hstack([matrix, numpy.full((pixels, 1), numpy.nan)])
+
+    # A spike is a non zero value between two zeros
+    spikes = valid & (matrix != 0) & (padded[rows, before] == 0) & \
+        (padded[rows, after] == 0)
+    fixed = numpy.where(valid & ~spikes, matrix, 0)
+
+    spikes = numpy.hstack([spikes, numpy.zeros((pixels, 1), dtype=bool)])
+
+    def cumulative(values):
+        return numpy.hstack([numpy.zeros((pixels, 1)),
+                             numpy.cumsum(values, axis=1)])
+
+    sums = {'count': cumulative(valid),
+            'sum': cumulative(fixed),
+            'abs_sum': cumulative(numpy.abs(fixed)),
+            'square_sum': cumulative(numpy.square(fixed))}
+
+    out_metrics = numpy.empty((len(windows), len(funcs), pixels),
+                              dtype=dtype)
+
+    rows = rows[:, 0]
+
+    with numpy.errstate(all='ignore'):
+        for w, (start, end) in enumerate(windows):
+            st = {key: value[:, end] - value[:, start]
+                  for key, value in sums.items()}
+
+            # The first and last values of the window are never spikes
+            head = first[:, start]
+            tail = last[:, end - 1]
+            for edge in [head, numpy.where(tail != head, tail, length)]:
+                inside = (edge >= start) & (edge < end) & spikes[rows, edge]
+                values = numpy.where(inside, padded[rows, edge], 0)
+                st['sum'] += values
+                st['abs_sum'] += numpy.abs(values)
+                st['square_sum'] += numpy.square(values)
+
+            n = st['count']
+            stats = {
+                'mean_ts': numpy.where(n > 0, st['sum'] / n, numpy.nan),
+                'sum_ts': st['sum'],
+                'mse_ts': numpy.where(n > 0, st['square_sum'], numpy.nan),
+                'abs_sum_ts': st['abs_sum']}
+
+            valid_window = check_input_batch(raw[:, start:end])
+
+            for i, f in enumerate(funcs):
+                out_metrics[w, i] = numpy.where(valid_window,
+                                                truncate_array(stats[f]),
+                                                numpy.nan)
+
+    return out_metrics
+
+
+def ts_basics_jit(matrix, funcs=["all"], nodata=-9999, num_cores=-1,
+                  dtype="float64"):
+    """This function computes the basic metrics and the Katz fractal \
+    dimension for every time series of a matrix with numba compiled \
+    kernels. Each time series is handled in a single pass, and the \
+    time series are split among threads, without the GIL.
+
+    The values produced are the same of ``ts_basics`` and ``katz_fd``, up \
+    to the floating point error of the sums. Time series that are rejected \
+    by ``check_input`` receive NaN for all metrics.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param funcs: List of metrics to be computed, among the basic metrics \
+    and katz_fd. Default is all basic metrics.
+    :type funcs: list
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: real number
+
+    :param num_cores: Number of threads to be used. \
+    Value -1 means all cores available.
+    :type num_cores: integer
+
+    :param dtype: Floating point type used in the computation and in \
+    the output. Default is float64.
+    :type dtype: string
+
+    :returns: Numpy array of metrics (metrics x pixels), following the \
+    order of ``funcs``.
+    """
+    import numba
+
+    if num_cores == -1:
+        num_cores = numba.config.NUMBA_NUM_THREADS
+    elif num_cores == 0:
+        num_cores = 1
+
+    threads = numba.get_num_threads()
+    numba.set_num_threads(min(num_cores, numba.config.NUMBA_NUM_THREADS))
+    try:
+        return _jit_metrics(matrix, funcs, nodata, True, dtype)
+    finally:
+        numba.set_num_threads(threads)
+
+
+def _jit_metrics(matrix, funcs=["all"], nodata=-9999, parallel=True,
+                 dtype="float64"):
+    # Metrics of a matrix of time series computed by the kernels, with \
+    # prange threads or in the calling thread
+    from .utils import fixseries_batch, check_input_batch, truncate_array, \
+        error_basics
+
+    if "all" in funcs:
+        funcs = list(error_basics().keys())
+
+    for f in funcs:
+        if f not in KERNEL_METRICS:
+            raise ValueError("Metric not available in the kernels: " +
+                             str(f))
+
+    valid = check_input_batch(matrix)
+    ts = fixseries_batch(matrix, nodata, dtype)
+    count = numpy.sum(~numpy.isnan(ts), axis=1)
+
+    if parallel is True:
+        out = _basics_kernel(ts, count)
+    else:
+        out = numpy.empty((len(KERNEL_METRICS), ts.shape[0]))
+        _basics_rows(ts, count, out)
+
+    out[:, ~valid] = numpy.nan
+
+    rows = [KERNEL_METRICS.index(f) for f in funcs]
+
+    return truncate_array(out[rows]).astype(dtype)
+
+
+# Metrics computed by the kernels, in the order of their output
+KERNEL_METRICS = ['max_ts', 'min_ts', 'mean_ts', 'std_ts', 'sum_ts',
+                  'amplitude_ts', 'mse_ts', 'fslope_ts', 'skew_ts', 'amd_ts',
+                  'abs_sum_ts', 'iqr_ts', 'fqr_ts', 'sqr_ts', 'tqr_ts',
+                  'katz_fd']
+
+
+@njit(parallel=True, nogil=True, cache=True, error_model="numpy")
+def _basics_kernel(ts, count):
+    # Metrics of every fixed time series of the matrix (metrics x pixels)
+    out = numpy.empty((16, ts.shape[0]))
+
+    for i in prange(ts.shape[0]):
+        _basics_row(ts[i, :count[i]], out[:, i])
+
+    return out
+
+
+@njit(nogil=True, cache=True, error_model="numpy")
+def _basics_rows(ts, count, out):
+    # Metrics of every fixed time series of the matrix in a single thread, \
+    # written in out (metrics x pixels)
+    for i in range(ts.shape[0]):
+        _basics_row(ts[i, :count[i]], out[:, i])
+
+
+@njit(nogil=True, cache=True, error_model="numpy")
+def _basics_row(x, out):
+    # Metrics of a fixed time series, following KERNEL_METRICS
+    n = x.shape[0]
+
+    for k in range(out.shape[0]):
+        out[k] = numpy.nan
+    out[4] = 0.0
+    out[10] = 0.0
+
+    if n == 0:
+        return
+
+    # First pass: extremes, sums and differences
+    vmax = x[0]
+    vmin = x[0]
+    total = 0.0
+    abs_total = 0.0
+    squares = 0.0
+    diff_total = 0.0
+    diff_max = 0.0
+    for j in range(n):
+        v = x[j]
+        vmax = max(vmax, v)
+        vmin = min(vmin, v)
+        total += v
+        abs_total += abs(v)
+        squares += v * v
+        if j > 0:
+            d = abs(v - x[j - 1])
+            diff_total += d
+            diff_max = max(diff_max, d)
+
+    mean = total / n
+
+    # Second pass: central moments
+    m2 = 0.0
+    m3 = 0.0
+    for j in range(n):
+        d = x[j] - mean
+        m2 += d * d
+        m3 += d * d * d
+    m2 /= n
+    m3 /= n
+
+    out[0] = vmax
+    out[1] = vmin
+    out[2] = mean
+    out[3] = numpy.sqrt(m2)
+    out[4] = total
+    out[5] = vmax - vmin
+    # Parseval's theorem: mean squared magnitude of the fft
+    out[6] = squares
+    out[10] = abs_total
+
+    # scipy.stats.skew returns NaN for constant time series
+    if m2 > (numpy.finfo(numpy.float64).resolution * mean) ** 2:
+        out[8] = m3 / m2 ** 1.5
+
+    if n > 1:
+        out[7] = diff_max
+        out[9] = diff_total / (n - 1)
+
+        # Katz fractal dimension
+        ln = numpy.log10(diff_total / (diff_total / (n - 1)))
+        out[15] = ln / (ln + numpy.log10((vmax - vmin) / diff_total))
+
+    # Quartiles, as numpy.percentile with linear and midpoint interpolation
+    s = numpy.sort(x)
+    q1 = _percentile(s, 0.25, False)
+    q3 = _percentile(s, 0.75, False)
+    out[11] = q3 - q1
+    out[12] = _percentile(s, 0.25, True)
+    out[13] = _percentile(s, 0.5, False)
+    out[14] = _percentile(s, 0.75, True)
+
+
+@njit(nogil=True, cache=True, error_model="numpy")
+def _percentile(s, q, midpoint):
+    # Percentile of a sorted array, following numpy.percentile
+    n = s.shape[0]
+    index = (n - 1) * q
+
+    if midpoint:
+        index = 0.5 * (numpy.floor(index) + numpy.ceil(index))
+
+    if index >= n - 1:
+        return s[n - 1]
+
+    lo = int(numpy.floor(index))
+
+    if midpoint:
+        gamma = 0.0 if index % 1 == 0 else 0.5
+    else:
+        gamma = index - lo
+
+    a = s[lo]
+    b = s[lo + 1]
+    diff = b - a
+
+    if gamma >= 0.5:
+        return b - diff * (1 - gamma)
+
+    return a + diff * gamma
+
+
+class BasicsAccumulator(object):
+    """This class computes the basic metrics of append-only time series \
+    incrementally, one time slice at a time.
+
+    The state keeps running moments of each pixel in arrays, so each new \
+    slice is added in O(pixels) without reading the previous slices again. \
+    ``finalize`` produces the values of ``ts_basics`` for max, min, mean, \
+    std, sum, amplitude, mse, fslope, skew, amd and abs_sum, up to the \
+    floating point error of the running moments. Quartiles can not be \
+    computed incrementally.
+
+    As in ``fixseries``, a value between two zeros is a spike and is \
+    replaced by zero. Therefore, the last valid value of each pixel is only \
+    added to the moments when the next one arrives.
+
+    :param shape: Shape of each time slice (e.g. rows x columns).
+    :type shape: tuple
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: real number
+    """
+
+    metrics = ['max_ts', 'min_ts', 'mean_ts', 'std_ts', 'sum_ts',
+               'amplitude_ts', 'mse_ts', 'fslope_ts', 'skew_ts', 'amd_ts',
+               'abs_sum_ts']
+
+    def __init__(self, shape, nodata=-9999):
+        self.nodata = nodata
+        self.length = 0
+        self.state = {
+            'all_nan': numpy.ones(shape, dtype=bool),
+            'all_zero': numpy.ones(shape, dtype=bool),
+            'prev2': numpy.full(shape, numpy.nan),
+            'prev1': numpy.full(shape, numpy.nan),
+            'last': numpy.full(shape, numpy.nan),
+            'count': numpy.zeros(shape),
+            'mean': numpy.zeros(shape),
+            'm2': numpy.zeros(shape),
+            'm3': numpy.zeros(shape),
+            'max': numpy.full(shape, numpy.nan),
+            'min': numpy.full(shape, numpy.nan),
+            'sum': numpy.zeros(shape),
+            'abs_sum': numpy.zeros(shape),
+            'square_sum': numpy.zeros(shape),
+            'diff_sum': numpy.zeros(shape),
+            'diff_max': numpy.full(shape, numpy.nan)}
+
+    def update(self, values):
+        """Adds a new time slice to the state.
+
+        :param values: Values of the new date for each pixel.
+        :type values: numpy.ndarray
+        """
+        st = self.state
+
+        values = numpy.array(values, dtype=float)
+
+        # check_input rules are applied over the raw time series
+        self.length += 1
+        st['all_nan'] &= numpy.isnan(values)
+        st['all_zero'] &= values == 0
+
+        # Remove nodata, as fixseries zeros are kept when nodata is 0
+        if self.nodata != 0:
+            values[values == self.nodata] = numpy.nan
+
+        valid = ~numpy.isnan(values)
+
+        # The previous value is final now: it is a spike if it lies \
+        # between two zeros of the original time series
+        pending = valid & ~numpy.isnan(st['prev1'])
+        spike = pending & (st['prev2'] == 0) & (st['prev1'] != 0) & \
+            (values == 0)
+
+        self._add(st, numpy.where(spike, 0, st['prev1']), pending)
+
+        st['prev2'] = numpy.where(valid, st['prev1'], st['prev2'])
+        st['prev1'] = numpy.where(valid, values, st['prev1'])
+
+    def finalize(self, funcs=["all"]):
+        """Computes the metrics of the time series added so far. The state \
+        is not changed, so new slices can still be added.
+
+        :param funcs: List of basic metrics to be computed. Default is all \
+        metrics available.
+        :type funcs: list
+
+        :returns: Numpy array of metrics (metrics x shape), following the \
+        order of ``funcs``.
+        """
+        from .utils import truncate_array
+
+        if "all" in funcs:
+            funcs = self.metrics
+
+        st = {key: value.copy() for key, value in self.state.items()}
+
+        # The last value of each time series can not be a spike
+        self._add(st, st['prev1'], ~numpy.isnan(st['prev1']))
+
+        n = st['count']
+        valid = (self.length >= 5) & ~st['all_nan'] & ~st['all_zero']
+
+        with numpy.errstate(all='ignore'):
+            m2 = st['m2'] / n
+            m3 = st['m3'] / n
+            zero = m2 <= (numpy.finfo(float).resolution * st['mean']) ** 2
+
+            stats = {
+                'max_ts': st['max'],
+                'min_ts': st['min'],
+                'mean_ts': numpy.where(n > 0, st['mean'], numpy.nan),
+                'std_ts': numpy.sqrt(m2),
+                'sum_ts': st['sum'],
+                'amplitude_ts': st['max'] - st['min'],
+                'mse_ts': numpy.where(n > 0, st['square_sum'], numpy.nan),
+                'fslope_ts': st['diff_max'],
+                'skew_ts': numpy.where(zero, numpy.nan, m3 / m2 ** 1.5),
+                'amd_ts': numpy.where(n > 1, st['diff_sum'] / (n - 1),
+                                      numpy.nan),
+                'abs_sum_ts': st['abs_sum']}
+
+            out_metrics = numpy.full((len(funcs),) + n.shape, numpy.nan)
+
+            for i, f in enumerate(funcs):
+                if f not in stats:
+                    raise ValueError("Unknown incremental basic metric: " +
+                                     str(f))
+                out_metrics[i] = numpy.where(valid,
+                                             truncate_array(stats[f]),
+                                             numpy.nan)
+
+        return out_metrics
+
+    def save(self, path):
+        """Saves the state in a numpy ``.npz`` file.
+
+        :param path: Path of the file.
+        :type path: string
+        """
+        numpy.savez(path, length=self.length, nodata=self.nodata,
+                    **self.state)
+
+    @classmethod
+    def load(cls, path):
+        """Restores an accumulator saved by ``save``.
+
+        :param path: Path of the file.
+        :type path: string
+
+        :returns: BasicsAccumulator with the restored state.
+        """
+        with numpy.load(path) as data:
+            accumulator = cls(data['count'].shape, data['nodata'].item())
+            accumulator.length = int(data['length'])
+            for key in accumulator.state:
+                accumulator.state[key] = data[key]
+
+        return accumulator
+
+    @staticmethod
+    def _add(st, values, mask):
+        # Add the final values of the masked pixels to the moments
+        has_last = mask & ~numpy.isnan(st['last'])
+        dist = numpy.abs(values - st['last'])
+        st['diff_sum'] += numpy.where(has_last, dist, 0)
+        st['diff_max'] = numpy.fmax(st['diff_max'],
+                                    numpy.where(has_last, dist, numpy.nan))
+        st['last'] = numpy.where(mask, values, st['last'])
+
+        x = numpy.where(mask, values, 0)
+        n1 = st['count']
+        n = n1 + mask
+
+        with numpy.errstate(all='ignore'):
+            delta = numpy.where(mask, x - st['mean'], 0)
+            delta_n = numpy.where(mask, delta / n, 0)
+
+        term = delta * delta_n * n1
+        st['mean'] += delta_n
+        st['m3'] += term * delta_n * (n - 2) - 3 * delta_n * st['m2']
+        st['m2'] += term
+        st['count'] = n
+
+        st['max'] = numpy.fmax(st['max'], numpy.where(mask, x, numpy.nan))
+        st['min'] = numpy.fmin(st['min'], numpy.where(mask, x, numpy.nan))
+        st['sum'] += x
+        st['abs_sum'] += numpy.abs(x)
+        st['square_sum'] += numpy.square(x)
+
+
 def mean_ts(timeseries, nodata=-9999):
     """Average value (mean) of the time series, considering only valid \
     values. When nodata is found, it is not included in N value (for all functions). 
@@ -89,7 +732,7 @@ def mean_ts(timeseries, nodata=-9999):
 
     :returns: Mean value of time series.
     """
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.mean(ts))
 
@@ -105,7 +748,7 @@ def max_ts(timeseries, nodata=-9999):
 
     :returns: Maximum value of time series.
     """
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.max(ts))
 
@@ -121,7 +764,7 @@ def min_ts(timeseries, nodata=-9999):
 
     :returns: Minimum value of time series.
     """
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.min(ts))
 
@@ -138,7 +781,7 @@ def std_ts(timeseries, nodata=-9999):
     :returns: Standard deviation of time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.std(ts))
 
@@ -157,7 +800,7 @@ def sum_ts(timeseries, nodata=-9999):
 
     :returns: Sum of values of time series.
     """
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.sum(ts))
 
@@ -175,7 +818,7 @@ def amplitude_ts(timeseries, nodata=-9999):
     :returns: Amplitude of values of time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.max(ts) - numpy.min(ts))
 
@@ -193,9 +836,9 @@ def fslope_ts(timeseries, nodata=-9999):
     :returns: The maximum value of the first slope of time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata)
 
-    return truncate(numpy.max(abs(numpy.diff(ts))))
+    return truncate(numpy.max(abs(ts.diff)))
 
 
 def abs_sum_ts(timeseries, nodata=-9999):
@@ -211,7 +854,7 @@ def abs_sum_ts(timeseries, nodata=-9999):
     :returns: Sum of absolute values of the time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(numpy.sum(numpy.abs(ts)))
 
@@ -229,7 +872,7 @@ def skew_ts(timeseries, nodata=-9999):
     """
     from scipy import stats
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(stats.skew(ts))
 
@@ -248,9 +891,9 @@ def amd_ts(timeseries, nodata=-9999):
 
     :returns: The mean of the absolute derivative of time series.
     """
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata)
 
-    return truncate(numpy.mean(numpy.abs(numpy.diff(ts))))
+    return truncate(numpy.mean(numpy.abs(ts.diff)))
 
 
 def mse_ts(timeseries, nodata=-9999):
@@ -269,9 +912,9 @@ def mse_ts(timeseries, nodata=-9999):
     :returns: The mean spectral energy of the time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata)
 
-    return truncate(numpy.mean(numpy.square(numpy.abs(numpy.fft.fft(ts)))))
+    return truncate(numpy.mean(numpy.square(numpy.abs(ts.fft))))
 
 
 def fqr_ts(timeseries, nodata=-9999):
@@ -286,9 +929,9 @@ def fqr_ts(timeseries, nodata=-9999):
     :returns: The first quartile of the time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    quartiles = prepare(timeseries, nodata).quartiles
 
-    return truncate(numpy.percentile(ts, 25, interpolation='midpoint'))
+    return truncate(quartiles['midpoint'][0])
 
 
 def tqr_ts(timeseries, nodata=-9999):
@@ -303,9 +946,9 @@ def tqr_ts(timeseries, nodata=-9999):
     :returns: The third quartile of the time series.
     """
 
-    ts = fixseries(timeseries, nodata)
+    quartiles = prepare(timeseries, nodata).quartiles
 
-    return truncate(numpy.percentile(ts, 75, interpolation='midpoint'))
+    return truncate(quartiles['midpoint'][1])
 
 
 def sqr_ts(timeseries, nodata=-9999):
@@ -320,9 +963,9 @@ def sqr_ts(timeseries, nodata=-9999):
     :returns: The second quartile of the time series.
 
     """
-    ts = fixseries(timeseries, nodata)
+    quartiles = prepare(timeseries, nodata).quartiles
 
-    return truncate(numpy.percentile(ts, 50, interpolation='linear'))
+    return truncate(quartiles['linear'][1])
 
 
 def iqr_ts(timeseries, nodata=-9999):
@@ -336,10 +979,27 @@ def iqr_ts(timeseries, nodata=-9999):
 
     :returns: The interquaritle range of the time series.
     """
-    ts = fixseries(timeseries, nodata)
-
     # interpolation is linear by deafult
-    q1 = numpy.percentile(ts, 25, interpolation='linear')
-    q3 = numpy.percentile(ts, 75, interpolation='linear')
+    q1, _, q3 = prepare(timeseries, nodata).quartiles['linear']
 
     return truncate(q3 - q1)
+
+
+# Metrics of the module and the intermediates of PreparedSeries they use
+METRICS = {
+    'max_ts': (max_ts, ['series']),
+    'min_ts': (min_ts, ['series']),
+    'mean_ts': (mean_ts, ['series']),
+    'std_ts': (std_ts, ['series']),
+    'sum_ts': (sum_ts, ['series']),
+    'amplitude_ts': (amplitude_ts, ['series']),
+    'mse_ts': (mse_ts, ['fft']),
+    'fslope_ts': (fslope_ts, ['diff']),
+    'skew_ts': (skew_ts, ['series']),
+    'amd_ts': (amd_ts, ['diff']),
+    'abs_sum_ts': (abs_sum_ts, ['series']),
+    'iqr_ts': (iqr_ts, ['quartiles']),
+    'fqr_ts': (fqr_ts, ['quartiles']),
+    'sqr_ts': (sqr_ts, ['quartiles']),
+    'tqr_ts': (tqr_ts, ['quartiles']),
+}
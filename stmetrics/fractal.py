@@ -1,5 +1,5 @@
 import numpy
-from .utils import fixseries, truncate
+from .utils import prepare, truncate
 
 
 def ts_fractal(timeseries, funcs=['all'], nodata=-9999):
@@ -14,7 +14,7 @@ def ts_fractal(timeseries, funcs=['all'], nodata=-9999):
         - KFD: This algorirhm computes the FD using Katz algorithm.
 
     :param timeseries: Time series.
-    :type timeseries: numpy.ndarray
+    :type timeseries: numpy.ndarray or PreparedSeries
 
     :param nodata: nodata of the time series. Default is -9999.
     :type nodata: int
@@ -23,6 +23,9 @@ def ts_fractal(timeseries, funcs=['all'], nodata=-9999):
     """
     out_metrics = dict()
 
+    # prepare time series once for all metrics
+    timeseries = prepare(timeseries, nodata)
+
     if "all" in funcs:
         funcs = [
                 'dfa_fd',
@@ -32,7 +35,7 @@ def ts_fractal(timeseries, funcs=['all'], nodata=-9999):
 
     for f in funcs:
         try:
-            out_metrics[f] = eval(f)(timeseries, nodata=nodata)
+            out_metrics[f] = METRICS[f][0](timeseries, nodata=nodata)
         except:
             out_metrics[f] = numpy.nan
 
@@ -75,11 +78,144 @@ def dfa_fd(timeseries, nvals=None,  overlap=True, order=1, nodata=-9999):
     """
     import nolds
 
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(nolds.dfa(ts, nvals, overlap, order))
 
 
+def dfa_batch(matrix, nvals=None, overlap=True, order=1, nodata=-9999,
+              dtype="float64"):
+    """Detrended Fluctuation Analysis (DFA) of every time series of a \
+    matrix, computed with vectorized numpy operations instead of one call \
+    of ``nolds.dfa`` per time series.
+
+    The profile of each time series is computed once, the windows are \
+    taken as strided views of it and the trends of all windows are \
+    removed with a single least squares projection. Time series with the \
+    same number of valid observations are processed together.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param nvals: Sizes of subseries to use. Default follows ``nolds.dfa``.
+    :type nvals: list
+
+    :param overlap: if True, there will be a 50% overlap on windows \
+    otherwise non-overlapping windows will be used.
+    :type overlap: Boolean
+
+    :param order: Polynomial order of trend to remove.
+    :type order: int
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :param dtype: Floating point type used in the computation and in \
+    the output. Default is float64.
+    :type dtype: string
+
+    :return dfa: Numpy array with the DFA of each time series.
+
+    .. Note::
+
+        The exponent is fitted by least squares, which is the same as \
+        ``nolds.dfa`` with ``fit_exp='poly'``. Time series that can not \
+        be analysed receive NaN.
+    """
+    from .utils import fixseries_batch, check_input_batch, truncate_array
+
+    valid = check_input_batch(matrix)
+    ts = fixseries_batch(matrix, nodata, dtype)
+    count = numpy.sum(~numpy.isnan(ts), axis=1)
+
+    dfa = numpy.full(ts.shape[0], numpy.nan, dtype=dtype)
+
+    # Time series with the same length are processed together
+    for n in numpy.unique(count[valid]):
+        rows = numpy.where(valid & (count == n))[0]
+        dfa[rows] = _dfa_block(ts[rows, :n], nvals, overlap, order)
+
+    return truncate_array(dfa).astype(dtype)
+
+
+def _dfa_block(block, nvals=None, overlap=True, order=1):
+    # DFA of a block of time series with the same length
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    total_N = block.shape[1]
+    out = numpy.full(block.shape[0], numpy.nan)
+
+    # Same default sizes of nolds.dfa
+    if nvals is None:
+        if total_N > 70:
+            nvals = _logarithmic_n(4, 0.1 * total_N, 1.2)
+        elif total_N > 10:
+            nvals = [4, 5, 6, 7, 8, 9]
+        else:
+            nvals = [total_N - 2, total_N - 1]
+
+    if len(nvals) < 2 or numpy.min(nvals) < 2 or \
+            numpy.max(nvals) >= total_N:
+        return out
+
+    # create the signal profile
+    walk = numpy.cumsum(block - block.mean(axis=1)[:, None], axis=1)
+
+    fluctuations = numpy.zeros((block.shape[0], len(nvals)))
+
+    for k, n in enumerate(nvals):
+        # subdivide data into windows of size n
+        if overlap:
+            starts = numpy.arange(0, total_N - n, n // 2)
+            d = sliding_window_view(walk, n, axis=1)[:, starts, :]
+        else:
+            d = walk[:, :total_N - (total_N % n)]
+            d = d.reshape(block.shape[0], total_N // n, n)
+
+        # remove local polynomial trends projecting on the polynomial basis
+        x = numpy.vander(numpy.arange(n), order + 1)
+        residual = d - d @ (x @ numpy.linalg.pinv(x)).T
+
+        # mean fluctuation over all windows
+        flucs = numpy.sqrt(numpy.sum(residual ** 2, axis=2) / n)
+        fluctuations[:, k] = flucs.mean(axis=1)
+
+    return _loglog_slope(numpy.array(nvals), fluctuations)
+
+
+def _loglog_slope(x, y):
+    # Least squares slope of log(y) against log(x) for each row, ignoring \
+    # zero values as nolds does
+    w = y > 0
+    npoints = w.sum(axis=1)
+
+    logx = numpy.log(x)[None, :] * w
+    with numpy.errstate(divide='ignore'):
+        logy = numpy.where(w, numpy.log(numpy.where(w, y, 1)), 0)
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        mx = logx.sum(axis=1) / npoints
+        my = logy.sum(axis=1) / npoints
+        dx = (logx - mx[:, None]) * w
+        dy = (logy - my[:, None]) * w
+        slope = (dx * dy).sum(axis=1) / (dx ** 2).sum(axis=1)
+
+    return numpy.where(npoints >= 2, slope, numpy.nan)
+
+
+def _logarithmic_n(min_n, max_n, factor):
+    # Sizes multiplied by a factor until max_n, as in nolds.logarithmic_n
+    max_i = int(numpy.floor(numpy.log(1.0 * max_n / min_n) /
+                            numpy.log(factor)))
+    ns = [min_n]
+    for i in range(max_i + 1):
+        n = int(numpy.floor(min_n * (factor ** i)))
+        if n > ns[-1]:
+            ns.append(n)
+
+    return ns
+
+
 def hurst_exp(timeseries, nvals=None, nodata=-9999):
     """Computes the Hurst Exponent (HE) by a standard \
     rescaled range (R/S) approach.
@@ -108,11 +244,97 @@ def hurst_exp(timeseries, nvals=None, nodata=-9999):
         documentation page.
     """
     import nolds
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     return truncate(nolds.hurst_rs(ts, nvals))
 
 
+def hurst_batch(matrix, nvals=None, nodata=-9999, dtype="float64"):
+    """Hurst Exponent (HE) of every time series of a matrix, computed by \
+    the rescaled range (R/S) approach with vectorized numpy operations \
+    instead of one call of ``nolds.hurst_rs`` per time series.
+
+    The rescaled ranges of all time series and all subseries sizes are \
+    computed with vectorized cumulative operations, followed by one least \
+    squares fit per time series. Time series with the same number of \
+    valid observations are processed together.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param nvals: Sizes of subseries to use. Default follows \
+    ``nolds.hurst_rs``.
+    :type nvals: list
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :param dtype: Floating point type used in the computation and in \
+    the output. Default is float64.
+    :type dtype: string
+
+    :return hurst: Numpy array with the Hurst Exponent of each time series.
+
+    .. Note::
+
+        The exponent is fitted by least squares, which is the same as \
+        ``nolds.hurst_rs`` with ``fit='poly'``. Time series that are too \
+        short or can not be analysed receive NaN, instead of raising an \
+        exception.
+    """
+    from .utils import fixseries_batch, check_input_batch, truncate_array
+
+    valid = check_input_batch(matrix)
+    ts = fixseries_batch(matrix, nodata, dtype)
+    count = numpy.sum(~numpy.isnan(ts), axis=1)
+
+    hurst = numpy.full(ts.shape[0], numpy.nan, dtype=dtype)
+
+    # Time series with the same length are processed together
+    for n in numpy.unique(count[valid & (count > 1)]):
+        rows = numpy.where(valid & (count == n))[0]
+        hurst[rows] = _hurst_block(ts[rows, :n], nvals)
+
+    return truncate_array(hurst).astype(dtype)
+
+
+def _hurst_block(block, nvals=None):
+    # Hurst exponent of a block of time series with the same length
+    import nolds
+
+    total_N = block.shape[1]
+
+    if nvals is None:
+        nvals = nolds.logmid_n(total_N, ratio=1/4.0, nsteps=15)
+
+    nvals = numpy.asarray(nvals)
+    nvals = nvals[(nvals > 1) & (nvals <= total_N)]
+
+    rsvals = numpy.full((block.shape[0], len(nvals)), numpy.nan)
+
+    for k, n in enumerate(nvals):
+        # split data into subsequences of length n
+        m = total_N // n
+        seqs = block[:, :m * n].reshape(block.shape[0], m, n)
+
+        # ranges of the cumulative sums of the normalized subsequences
+        y = numpy.cumsum(seqs - seqs.mean(axis=2)[:, :, None], axis=2)
+        r = y.max(axis=2) - y.min(axis=2)
+        s = numpy.std(seqs, axis=2, ddof=1)
+
+        # zero ranges are excluded from the analysis
+        nonzero = r != 0
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            rs = numpy.where(nonzero, r / numpy.where(nonzero, s, 1), 0)
+            rsvals[:, k] = rs.sum(axis=1) / nonzero.sum(axis=1)
+
+    # correct by the expected (R/S)_n of white noise
+    expected = numpy.array([nolds.expected_rs(n) for n in nvals])
+    rsvals = numpy.where(numpy.isnan(rsvals), 0, rsvals / expected)
+
+    return _loglog_slope(nvals, rsvals) + 0.5
+
+
 def katz_fd(timeseries, nodata=-9999):
     """Katz fractal dimension.
 
@@ -148,16 +370,24 @@ def katz_fd(timeseries, nodata=-9999):
         Conference on Computational Intelligence in Medicine and Healthcare \
         (CIMED2005). 2005.
     """
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata)
 
     # absolute differences between consecutive elements of an array
-    dists = numpy.abs(numpy.ediff1d(ts))
+    dists = numpy.abs(ts.diff)
     # sum distances
     d_sum = dists.sum()
     # compute ln using the accumulated distance and the average distance
     ln = numpy.log10(numpy.divide(d_sum, dists.mean()))
     # define box limit
-    d = numpy.max(ts) - numpy.min(ts)
+    d = numpy.max(ts.series) - numpy.min(ts.series)
     ln_sum = numpy.add(ln, numpy.log10(numpy.divide(d, d_sum)))
     # return katz fractal dimension
     return truncate(numpy.divide(ln, ln_sum))
+
+
+# Metrics of the module and the intermediates of PreparedSeries they use
+METRICS = {
+    'dfa_fd': (dfa_fd, ['series']),
+    'hurst_exp': (hurst_exp, ['series']),
+    'katz_fd': (katz_fd, ['diff']),
+}
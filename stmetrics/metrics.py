@@ -25,9 +25,13 @@ def get_metrics(series, metrics_dict=METRICS_DICT, nodata=-9999, show=False):
     from .basics import ts_basics
     from .polar import ts_polar
     from .fractal import ts_fractal
+    from .utils import prepare
 
     time_metrics = dict()
 
+    # prepare time series once for all metric groups
+    series = prepare(series, nodata)
+
     # call functions
     if "basics" in metrics_dict:
         time_metrics["basics"] = ts_basics(series,
@@ -47,31 +51,123 @@ def get_metrics(series, metrics_dict=METRICS_DICT, nodata=-9999, show=False):
     return time_metrics
 
 
-def _getmetrics(timeseries, metrics_dict=METRICS_DICT):
+def metrics_schema(metrics_dict=METRICS_DICT, dtype="float64"):
+    """This function resolves a dictionary of metrics to the ordered \
+    layers computed by ``sits2metrics``.
+
+    :param metrics_dict: Dictionary with metrics to be computed.
+    :type metrics_dict: dictionary
+
+    :param dtype: Data type of the layers, as given to ``sits2metrics`` \
+    or ``sits2raster``. Default is float64.
+    :type dtype: string
 
-    # Setup empty numpy array
-    metricas = numpy.array([])
+    :returns schema: List with the name, the dtype and the group of each \
+    layer, in the order of the output.
+    """
+    from .utils import error_basics, error_polar, error_fractal
 
-    # Compute metrics based on dict
-    out_metrics = get_metrics(timeseries, metrics_dict, show=False)
+    schema = []
 
-    # Loop through dict keys and setup the array
-    for key in out_metrics.keys():
-        vals = numpy.vstack([out_metrics[key][i]
-                             for i in out_metrics[key].keys()])
+    for group, error in [("basics", error_basics),
+                         ("polar", error_polar),
+                         ("fractal", error_fractal)]:
+        if group in metrics_dict:
+            funcs = metrics_dict[group]
+            if "all" in funcs:
+                funcs = list(error().keys())
+
+            for name in dict.fromkeys(funcs):
+                schema.append((name, numpy.dtype(dtype).name, group))
+
+    return schema
+
+
+def metrics_plan(metrics_dict=METRICS_DICT):
+    """This function resolves a dictionary of metrics to the minimal set \
+    of intermediates of ``PreparedSeries`` shared by the metrics and the \
+    functions that compute each layer of ``metrics_schema``.
+
+    :param metrics_dict: Dictionary with metrics to be computed.
+    :type metrics_dict: dictionary
+
+    :returns plan: Tuple with the names of the intermediates, in the order \
+    they must be computed, and the function of each layer (None for \
+    unknown metrics).
+    """
+    from . import basics, polar, fractal
+    from .utils import PreparedSeries
+
+    registry = {"basics": basics.METRICS,
+                "polar": polar.METRICS,
+                "fractal": fractal.METRICS}
+
+    intermediates = []
+
+    def require(name):
+        for dependency in PreparedSeries.requires[name]:
+            require(dependency)
+        if name not in intermediates:
+            intermediates.append(name)
+
+    functions = []
+
+    for name, _, group in metrics_schema(metrics_dict):
+        func, uses = registry[group].get(name, (None, []))
+        functions.append(func)
+
+        for intermediate in uses:
+            require(intermediate)
+
+    return intermediates, functions
+
+
+def _getmetrics(timeseries, metrics_dict=METRICS_DICT):
+    # Metrics of a time series, as an array (metrics x 1)
+    plan = metrics_plan(metrics_dict)
+
+    metricas = numpy.empty((len(plan[1]), 1))
+
+    _fill_metrics(timeseries, plan, metricas[:, 0])
 
-        # Check size of intial array
-        if metricas.size == 0:
-            metricas = vals
-        else:
-            metricas = numpy.vstack((metricas, vals))
     return metricas
 
 
-def sits2metrics(dataset, metrics=METRICS_DICT, num_cores=-1):
+def _fill_metrics(timeseries, plan, out):
+    # Compute the metrics of a plan writing them in out
+    from .utils import prepare
+
+    intermediates, functions = plan
+
+    # prepare time series once for all metrics
+    timeseries = prepare(timeseries, -9999)
+
+    # Shared intermediates are computed once, their errors are kept by \
+    # the prepared time series and raised by the metrics that use them
+    for name in intermediates:
+        try:
+            getattr(timeseries, name)
+        except:
+            pass
+
+    for i, func in enumerate(functions):
+        try:
+            out[i] = func(timeseries, nodata=-9999)
+        except:
+            out[i] = numpy.nan
+
+
+def sits2metrics(dataset, metrics=METRICS_DICT, num_cores=-1,
+                 block_size=None, shared=False, checkpoint=None,
+                 threads=False, dtype="float64", windows=None, window=None,
+                 step=None):
     """This function performs the computation of the metrics using \
     multiprocessing.
 
+    The image is split in blocks of contiguous rows, that are sent to \
+    the workers. Each worker computes the metrics of a whole block, which \
+    are written in the output as soon as they are ready.
+
     :param dataset: Time series.
     :type dataset: rasterio dataset, numpy array (ZxMxN) - Z \
     is the time series lenght or xarray.Dataset
@@ -80,95 +176,798 @@ def sits2metrics(dataset, metrics=METRICS_DICT, num_cores=-1):
     :type metrics_dict: dictionary
 
     :param num_cores: Number of cores to be used. \
-    Value -1 means all cores available.
+    Value -1 means all cores available. It is ignored for xarray \
+    variables backed by dask, that are computed lazily by the dask \
+    scheduler, one core per chunk. Most metrics hold the GIL, so the \
+    default threaded scheduler computes one chunk at a time. Use \
+    ``dask.config.set(scheduler="processes")`` or a distributed client \
+    with several worker processes to compute the chunks in parallel.
     :type num_cores: integer \
 
+    :param block_size: Number of rows of the image in each block sent to \
+    the workers. Default splits the image in four blocks per core.
+    :type block_size: integer
+
+    :param shared: If True, the image and the metrics are kept in shared \
+    memory. The workers attach to it by name and read and write their \
+    blocks in place, so no block is pickled to or from the workers. \
+    Requires Python 3.8+.
+    :type shared: boolean
+
+    :param checkpoint: Directory where each finished block is stored, in a \
+    memory-mapped ``metrics.npy``, and recorded in ``manifest.json``. If \
+    the job is restarted with the same directory, only the missing blocks \
+    are computed, with the block size of the checkpoint unless another is \
+    given.
+    :type checkpoint: string
+
+    :param threads: If True, the metrics are computed by numba compiled \
+    kernels in threads that share the image, with no pickling. Only the \
+    basic metrics and katz_fd are available.
+    :type threads: boolean
+
+    :param dtype: Floating point type of the metrics. float32 halves the \
+    size of the output and, with threads, is also used in the computation.
+    :type dtype: string
+
+    :param windows: List of windows of the time series, as (start, end) \
+    positions (the end is not included), e.g. one window per season. The \
+    metrics of all windows are computed in a single pass over the image, \
+    and each window is handled as a time series of its own.
+    :type windows: list
+
+    :param window: Length of sliding windows, used when ``windows`` is not \
+    informed.
+    :type window: integer
+
+    :param step: Distance between the starts of the sliding windows. \
+    Default is ``window``, so the windows do not overlap.
+    :type step: integer
+
     :returns image: Numpy matrix of metrics or xarray.Dataset \
     with the metrics as an dataset. The orders of the dimensions, \
-    follows the dictionary provided.
+    follows the dictionary provided. With windows, the metrics have an \
+    extra first dimension with one entry per window.
     """
     import rasterio
     import xarray
 
-    if isinstance(dataset, rasterio.io.DatasetReader):
+    if not numpy.issubdtype(numpy.dtype(dtype), numpy.floating):
+        raise ValueError("The metrics are computed as floating point. Use "
+                         "sits2raster or utils.quantize to store them as "
+                         "integers.")
+
+    if windows is not None or window is not None:
+        if threads is True or shared is True or checkpoint is not None:
+            raise ValueError("Windows can not be combined with threads, "
+                             "shared or checkpoint.")
+        windows = (windows, window, step)
+
+    if threads is True and isinstance(dataset, (rasterio.io.DatasetReader,
+                                                numpy.ndarray)):
+        if isinstance(dataset, rasterio.io.DatasetReader):
+            dataset = dataset.read()
+        return _sits2metrics_threads(dataset, metrics, num_cores, block_size,
+                                     dtype)
+    elif checkpoint is not None and isinstance(
+            dataset, (rasterio.io.DatasetReader, numpy.ndarray)):
+        return _sits2metrics_checkpoint(dataset, checkpoint, metrics,
+                                        num_cores, block_size, dtype)
+    elif shared is True and isinstance(dataset, (rasterio.io.DatasetReader,
+                                               numpy.ndarray)):
+        return _sits2metrics_shared(dataset, metrics, num_cores, block_size,
+                                    dtype)
+    elif isinstance(dataset, rasterio.io.DatasetReader):
         image = dataset.read()
-        return _sits2metrics(image, metrics, num_cores)
+        return _sits2metrics(image, metrics, num_cores, block_size, dtype,
+                             _resolve_windows(len(image), windows))
     elif isinstance(dataset, numpy.ndarray):
         image = dataset.copy()
-        return _sits2metrics(image, metrics, num_cores)
+        return _sits2metrics(image, metrics, num_cores, block_size, dtype,
+                             _resolve_windows(len(image), windows))
     elif isinstance(dataset, xarray.Dataset):
-        return _compute_from_xarray(dataset, metrics, num_cores)
+        return _compute_from_xarray(dataset, metrics, num_cores, dtype,
+                                    windows)
     else:
         print("Sorry we can't read this type of file.\
               Please use Rasterio, Numpy array or xarray.")
 
 
-def _sits2metrics(image, metrics_dict=METRICS_DICT, num_cores=-1):
+def _sits2metrics(image, metrics_dict=METRICS_DICT, num_cores=-1,
+                  block_size=None, dtype="float64", windows=None):
+    import multiprocessing as mp
+
+    rows = image.shape[1]
+
+    num_cores, block_size = _check_blocks(rows, num_cores, block_size)
+
+    errors = _error_metrics(metrics_dict)
+    masked_values = _nodata_metrics(metrics_dict)
+
+    if windows is None:
+        metricas = numpy.empty((len(errors),) + image.shape[1:], dtype=dtype)
+        func = _block_metrics
+    else:
+        metricas = numpy.empty((len(windows), len(errors)) + image.shape[1:],
+                               dtype=dtype)
+        func = _block_window_metrics
+
+    # Blocks of contiguous rows of the image. Blocks without any valid \
+    # time series are filled here and never sent to the workers.
+    tasks = ((r, image[:, r:r + block_size, :], metrics_dict, windows)
+             for r in range(0, rows, block_size)
+             if _fill_invalid(image[:, r:r + block_size, :],
+                              metricas[..., r:r + block_size, :], errors,
+                              masked_values))
+
+    if num_cores == 1:
+        blocks = map(func, tasks)
+    else:
+        # Initialize pool
+        pool = mp.Pool(num_cores)
+        blocks = pool.imap_unordered(func, tasks)
+
+    # Write each block in the output as soon as it is computed
+    for r, values in blocks:
+        metricas[..., r:r + values.shape[-2], :] = values
+
+    if num_cores != 1:
+        # Close pool
+        pool.close()
+
+    return metricas
+
+
+def _sits2metrics_threads(image, metrics_dict=METRICS_DICT, num_cores=-1,
+                          block_size=None, dtype="float64"):
+    from concurrent.futures import ThreadPoolExecutor
+    from .basics import KERNEL_METRICS, _jit_metrics
+
+    names = _metrics_names(metrics_dict)
+
+    unsupported = [name for name in names if name not in KERNEL_METRICS]
+    if unsupported:
+        raise ValueError("Metrics not available with threads: " +
+                         ", ".join(unsupported))
+
+    rows = image.shape[1]
+
+    num_cores, block_size = _check_blocks(rows, num_cores, block_size)
+
+    metricas = numpy.empty((len(names),) + image.shape[1:], dtype=dtype)
+
+    def compute(r):
+        # The kernels release the GIL, so the blocks run in parallel
+        block = image[:, r:r + block_size, :]
+        values = _jit_metrics(block.reshape(block.shape[0], -1).T, names,
+                              parallel=False, dtype=dtype)
+        metricas[:, r:r + block.shape[1], :] = values.reshape(
+            -1, block.shape[1], block.shape[2])
+
+    with ThreadPoolExecutor(num_cores) as pool:
+        list(pool.map(compute, range(0, rows, block_size)))
+
+    return metricas
+
+
+def _sits2metrics_shared(dataset, metrics_dict=METRICS_DICT, num_cores=-1,
+                         block_size=None, dtype="float64"):
+    import rasterio
+    import multiprocessing as mp
+
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise RuntimeError("shared=True requires Python 3.8+, that provides "
+                           "multiprocessing.shared_memory.")
+
+    if isinstance(dataset, rasterio.io.DatasetReader):
+        shape = (dataset.count, dataset.height, dataset.width)
+        in_dtype = numpy.dtype(dataset.dtypes[0])
+    else:
+        shape = dataset.shape
+        in_dtype = dataset.dtype
+
+    out_shape = (len(_metrics_names(metrics_dict)),) + tuple(shape[1:])
+
+    num_cores, block_size = _check_blocks(shape[1], num_cores, block_size)
+
+    shm_in = shared_memory.SharedMemory(
+        create=True, size=max(int(numpy.prod(shape)) * in_dtype.itemsize, 1))
+    out_dtype = numpy.dtype(dtype)
+
+    shm_out = shared_memory.SharedMemory(
+        create=True,
+        size=max(int(numpy.prod(out_shape)) * out_dtype.itemsize, 1))
+
+    try:
+        # Read the image straight into shared memory
+        image = numpy.ndarray(shape, dtype=in_dtype, buffer=shm_in.buf)
+        if isinstance(dataset, rasterio.io.DatasetReader):
+            dataset.read(out=image)
+        else:
+            image[:] = dataset
+        del image
+
+        tasks = [(r, block_size, shm_in.name, shape, in_dtype.str,
+                  shm_out.name, out_shape, out_dtype.str, metrics_dict)
+                 for r in range(0, shape[1], block_size)]
+
+        if num_cores == 1:
+            list(map(_shared_block_metrics, tasks))
+        else:
+            # Initialize pool
+            pool = mp.Pool(num_cores)
+            pool.map(_shared_block_metrics, tasks)
+            # Close pool
+            pool.close()
+
+        # Release the image before copying the metrics out
+        shm_in.close()
+        shm_in.unlink()
+        shm_in = None
+
+        metricas = numpy.ndarray(out_shape, dtype=out_dtype,
+                                 buffer=shm_out.buf)
+        metricas = metricas.copy()
+    finally:
+        for shm in [shm_in, shm_out]:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    return metricas
+
+
+def _shared_block_metrics(task):
+    # Compute a block of the image in shared memory and write its metrics \
+    # in place in the shared output
+    from multiprocessing import shared_memory
+
+    r, block_size, in_name, shape, dtype, out_name, out_shape, out_dtype, \
+        metrics_dict = task
+
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+
+    image = numpy.ndarray(shape, dtype=dtype, buffer=shm_in.buf)
+    metricas = numpy.ndarray(out_shape, dtype=out_dtype, buffer=shm_out.buf)
+
+    metricas[:, r:r + block_size, :] = _compute_block(
+        image[:, r:r + block_size, :], metrics_dict)
+
+    del image, metricas
+    shm_in.close()
+    shm_out.close()
+
+    return r
+
+
+def sits2raster(dataset, path, metrics=METRICS_DICT, num_cores=-1,
+                tile_size=None, cog=False, dtype="float64", scale=10000,
+                offset=0):
+    """This function computes the metrics of a rasterio dataset window \
+    by window and writes them in a multi-band GeoTIFF.
+
+    The image is never read as a whole. Each worker opens the dataset, \
+    reads its windows and computes their metrics, that are written in the \
+    output as soon as they are ready. The memory used depends only on the \
+    size of the windows.
+
+    :param dataset: Time series image. Each band is a date.
+    :type dataset: rasterio dataset or path to the image
+
+    :param path: Path of the output image.
+    :type path: string
+
+    :param metrics_dict: Dictionary with metrics to be computed.
+    :type metrics_dict: dictionary
+
+    :param num_cores: Number of cores to be used. \
+    Value -1 means all cores available.
+    :type num_cores: integer
+
+    :param tile_size: Size of the square windows to be computed. Default \
+    uses the block windows of tiled images and windows of 256 pixels \
+    otherwise.
+    :type tile_size: integer
+
+    :param cog: If True, the output is written as a Cloud Optimized GeoTIFF.
+    :type cog: boolean
+
+    :param dtype: Data type of the output image. Integer types store the \
+    metrics quantized by ``utils.quantize``, with the inverse of \
+    ``scale`` and ``offset`` recorded as the scale and offset of each \
+    band. Metrics out of the range of the type are stored as nodata and \
+    a warning names them.
+    :type dtype: string
+
+    :param scale: Multiplier of the metrics stored as integers, for all \
+    the bands or one per metric. Default is 10000.
+    :type scale: real number or list
+
+    :param offset: Value subtracted from the metrics stored as integers, \
+    for all the bands or one per metric. Default is 0.
+    :type offset: real number or list
+
+    :returns path: Path of the output image, with one band per metric. \
+    The profile, transform and crs are the same of the input.
+    """
+    import os
+    import warnings
+    import rasterio
+    import rasterio.shutil
+    import multiprocessing as mp
+    from .utils import quantize
+
+    if isinstance(dataset, rasterio.io.DatasetReader):
+        src_path = dataset.name
+    else:
+        src_path = dataset
+
+    names = _metrics_names(metrics)
+
+    with rasterio.open(src_path) as src:
+        profile = src.profile.copy()
+        windows = _raster_windows(src, tile_size)
+
+    quantized = numpy.issubdtype(numpy.dtype(dtype), numpy.integer)
+
+    if quantized:
+        nodata = int(numpy.iinfo(dtype).min)
+        scales = numpy.broadcast_to(numpy.asarray(scale, dtype=float),
+                                    (len(names),))
+        offsets = numpy.broadcast_to(numpy.asarray(offset, dtype=float),
+                                     (len(names),))
+        overflow = numpy.zeros(len(names), dtype=int)
+    else:
+        nodata = numpy.nan
+
+    profile.update(driver="GTiff", count=len(names), dtype=dtype,
+                   nodata=nodata, tiled=True, blockxsize=256,
+                   blockysize=256)
+
+    num_cores, _ = _check_blocks(1, num_cores)
+
+    if cog is True:
+        out_path = path + ".tmp.tif"
+    else:
+        out_path = path
+
+    tasks = ((w, metrics) for w in windows)
+
+    if num_cores == 1:
+        _init_raster_worker(src_path)
+        blocks = map(_window_metrics, tasks)
+    else:
+        # Initialize pool
+        pool = mp.Pool(num_cores, initializer=_init_raster_worker,
+                       initargs=(src_path,))
+        blocks = pool.imap_unordered(_window_metrics, tasks)
+
+    with rasterio.open(out_path, "w", **profile) as dst:
+        for band, name in enumerate(names, 1):
+            dst.set_band_description(band, name)
+
+        if quantized:
+            dst.scales = (1 / scales).tolist()
+            dst.offsets = offsets.tolist()
+
+        # Write each window as soon as it is computed
+        for window, values in blocks:
+            if quantized:
+                finite = numpy.isfinite(values)
+                values = quantize(values, scales, nodata, dtype, offsets)
+                overflow += (finite & (values == nodata)).reshape(
+                    len(names), -1).sum(axis=1)
+            dst.write(values.astype(dtype),
+                      window=rasterio.windows.Window(*window))
+
+    if num_cores != 1:
+        # Close pool
+        pool.close()
+    _init_raster_worker(None)
+
+    if quantized and overflow.any():
+        warnings.warn("Metrics out of the range of {} were stored as nodata: "
+                      "{}. Use a smaller scale or an offset for them.".format(
+                          dtype, ", ".join("{} ({} pixels)".format(n, c)
+                                           for n, c in zip(names, overflow)
+                                           if c)))
+
+    if cog is True:
+        rasterio.shutil.copy(out_path, path, driver="COG")
+        os.remove(out_path)
+
+    return path
+
+
+def _raster_windows(src, tile_size=None):
+    # Windows (col_off, row_off, width, height) covering the image
+    if tile_size is None and src.profile.get("tiled", False):
+        return [(w.col_off, w.row_off, w.width, w.height)
+                for _, w in src.block_windows(1)]
+
+    if tile_size is None:
+        tile_size = 256
+
+    return [(c, r, min(tile_size, src.width - c),
+             min(tile_size, src.height - r))
+            for r in range(0, src.height, tile_size)
+            for c in range(0, src.width, tile_size)]
+
+
+_RASTER = None
+
+
+def _init_raster_worker(path):
+    # Open the image once per worker
+    import rasterio
+    global _RASTER
+
+    if _RASTER is not None:
+        _RASTER.close()
+        _RASTER = None
+
+    if path is not None:
+        _RASTER = rasterio.open(path)
+
+
+def _window_metrics(task):
+    # Read a window of the image and compute its metrics
+    from rasterio.windows import Window
+
+    window, metrics_dict = task
+
+    block = _RASTER.read(window=Window(*window))
+
+    return window, _compute_block(block, metrics_dict)
+
+
+def _sits2metrics_checkpoint(dataset, directory, metrics_dict=METRICS_DICT,
+                             num_cores=-1, block_size=None, dtype="float64"):
+    import os
+    import json
+    import rasterio
     import multiprocessing as mp
+    from numpy.lib.format import open_memmap
+
+    names = _metrics_names(metrics_dict)
+
+    if isinstance(dataset, rasterio.io.DatasetReader):
+        rows, cols = dataset.height, dataset.width
+    else:
+        rows, cols = dataset.shape[1:]
+
+    store = os.path.join(directory, "metrics.npy")
+    manifest_path = os.path.join(directory, "manifest.json")
+
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        # The default block size depends on the cores, so a job is resumed \
+        # with the blocks it was created with
+        if block_size is None:
+            block_size = manifest.get("block_size")
 
-    # Take our full image, ignore the Fmask band, and reshape into long \
-    # 2d array (nrow * ncol, nband) for classification
-    new_shape = (image.shape[1] * image.shape[2], image.shape[0])
+    num_cores, block_size = _check_blocks(rows, num_cores, block_size)
 
-    # Reshape array
-    series = image[:, :, :].T.reshape(new_shape)
+    job = {"names": names, "shape": [len(names), rows, cols],
+           "block_size": block_size, "dtype": numpy.dtype(dtype).str}
+
+    if manifest is not None:
+        if any(manifest.get(k) != job[k] for k in job):
+            raise ValueError("The checkpoint in {} was created for "
+                             "another job.".format(directory))
+
+        metricas = open_memmap(store, mode="r+")
+    else:
+        os.makedirs(directory, exist_ok=True)
+        manifest = dict(job, done=[])
+
+        metricas = open_memmap(store, mode="w+", dtype=dtype,
+                               shape=tuple(job["shape"]))
+        _write_manifest(manifest_path, manifest)
+
+    done = set(manifest["done"])
+    missing = [r for r in range(0, rows, block_size) if r not in done]
+
+    # Blocks of rows that are not in the checkpoint yet
+    if isinstance(dataset, rasterio.io.DatasetReader):
+        initializer, initargs = _init_raster_worker, (dataset.name,)
+        tasks = (((0, r, cols, min(block_size, rows - r)), metrics_dict)
+                 for r in missing)
+        func = _window_metrics
+    else:
+        initializer, initargs = None, ()
+        tasks = ((r, dataset[:, r:r + block_size, :], metrics_dict)
+                 for r in missing)
+        func = _block_metrics
+
+    if num_cores == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        blocks = map(func, tasks)
+    else:
+        # Initialize pool
+        pool = mp.Pool(num_cores, initializer=initializer, initargs=initargs)
+        blocks = pool.imap_unordered(func, tasks)
+
+    # Store each block and record it as soon as it is computed
+    for r, values in blocks:
+        if isinstance(r, tuple):
+            r = r[1]
+        metricas[:, r:r + values.shape[1], :] = values
+        metricas.flush()
+
+        manifest["done"].append(r)
+        _write_manifest(manifest_path, manifest)
+
+    if num_cores != 1:
+        # Close pool
+        pool.close()
+    _init_raster_worker(None)
+
+    del metricas
+
+    return numpy.load(store, mmap_mode="r")
+
+
+def _write_manifest(path, manifest):
+    # Replace the manifest atomically, so a crash never leaves it broken
+    import os
+    import json
+
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _check_blocks(rows, num_cores=-1, block_size=None):
+    # Check core and block parameters
+    import multiprocessing as mp
 
-    # Check core parameter
     if num_cores == -1:
         num_cores = mp.cpu_count()
     elif num_cores == 0:
         num_cores = 1
 
-    # Initialize pool
-    pool = mp.Pool(num_cores)
+    if block_size is None:
+        block_size = int(numpy.ceil(rows / (num_cores * 4)))
+
+    return num_cores, max(int(block_size), 1)
 
-    # Use pool to compute metrics for each pixel
-    # Return a list of arrays
-    X_m = pool.starmap(_getmetrics, [(serie.astype(float), metrics_dict)
-                                     for serie in series])
 
-    # Close pool
-    pool.close()
+def _metrics_names(metrics_dict=METRICS_DICT):
+    # Names of the layers of the output
+    return [name for name, _, _ in metrics_schema(metrics_dict)]
 
-    # Conver list to numpy array
-    metricas = numpy.vstack(X_m)
 
-    # Reshape to image shape
-    return metricas.reshape(len(X_m[0]), image.shape[1],
-                            image.shape[2], order='F')
+def _error_metrics(metrics_dict=METRICS_DICT):
+    # Values of the metrics of an invalid time series
+    from .utils import error_basics, error_polar, error_fractal
 
+    errors = {"basics": error_basics(), "polar": error_polar(),
+              "fractal": error_fractal()}
 
-def _compute_from_xarray(dataset, metrics=METRICS_DICT, num_cores=-1):
+    return numpy.array([errors[group].get(name, numpy.nan)
+                        for name, _, group in metrics_schema(metrics_dict)],
+                       dtype=float)
+
+
+def _nodata_metrics(metrics_dict=METRICS_DICT):
+    # Values of the metrics of a time series with only nodata, that is \
+    # empty once fixed. They are not the errors of an invalid time series, \
+    # as the sums of an empty time series are 0.
+    plan = metrics_plan(metrics_dict)
+
+    values = numpy.empty(len(plan[1]))
+    _fill_metrics(numpy.full(5, -9999.), plan, values)
+
+    return values
+
+
+def _masked_series(series, valid):
+    # Valid time series without any observation other than nodata and NaN
+    return valid & numpy.all((series == -9999) | numpy.isnan(series), axis=1)
+
+
+def _fill_invalid(block, out, errors, masked_values):
+    # Fill a block without time series to compute with the error values, \
+    # or the values of the time series with only nodata. Returns True if \
+    # the block has any time series to compute.
+    from .utils import check_input_batch
+
+    series = block.reshape(block.shape[0], -1).T
+
+    valid = check_input_batch(series)
+    masked = _masked_series(series, valid)
+
+    if (valid & ~masked).any():
+        return True
+
+    out[:] = errors[:, None, None]
+    out[..., masked.reshape(block.shape[1:])] = masked_values[:, None]
+
+    return False
+
+
+def _block_metrics(task):
+    # Compute the metrics of a block of the image (time x rows x columns)
+    r, block, metrics_dict = task[:3]
+
+    return r, _compute_block(block, metrics_dict)
+
+
+def _block_window_metrics(task):
+    # Compute the metrics of each window of a block of the image
+    r, block, metrics_dict, windows = task
+
+    return r, _compute_block_windows(block, metrics_dict, windows)
+
+
+def _compute_block(block, metrics_dict=METRICS_DICT):
+    # Metrics of each pixel of a block, as an array (metrics x rows x columns)
+    from .utils import check_input_batch
+
+    series = block.reshape(block.shape[0], -1).T
+
+    # Invalid time series get the error values without being computed, \
+    # and the time series with only nodata their fixed values
+    valid = check_input_batch(series)
+    masked = _masked_series(series, valid)
+
+    plan = metrics_plan(metrics_dict)
+
+    values = numpy.empty((len(plan[1]), series.shape[0]))
+    values[:] = _error_metrics(metrics_dict)[:, None]
+
+    if masked.any():
+        values[:, masked] = _nodata_metrics(metrics_dict)[:, None]
+
+    for p in numpy.flatnonzero(valid & ~masked):
+        _fill_metrics(series[p].astype(float), plan, values[:, p])
+
+    return values.reshape(-1, block.shape[1], block.shape[2])
+
+
+def _compute_block_windows(block, metrics_dict=METRICS_DICT, windows=[]):
+    # Metrics of each window of each pixel of a block, as an array \
+    # (windows x metrics x rows x columns)
+    from .basics import WINDOW_METRICS, ts_basics_windows
+
+    schema = metrics_schema(metrics_dict)
+
+    series = block.reshape(block.shape[0], -1).T
+
+    values = numpy.empty((len(windows), len(schema), series.shape[0]))
+
+    # The additive metrics of all windows come from the same cumulative sums
+    cumulative = [i for i, (name, _, group) in enumerate(schema)
+                  if group == "basics" and name in WINDOW_METRICS]
+
+    if cumulative:
+        values[:, cumulative] = ts_basics_windows(
+            series, windows, [schema[i][0] for i in cumulative])
+
+    # The other metrics are computed over the slice of each window
+    others = [i for i in range(len(schema)) if i not in cumulative]
+
+    if others:
+        rest = dict()
+        for i in others:
+            rest.setdefault(schema[i][2], []).append(schema[i][0])
+
+        for w, (start, end) in enumerate(windows):
+            values[w, others] = _compute_block(
+                block[start:end], rest).reshape(len(others), -1)
+
+    return values.reshape(len(windows), -1, block.shape[1], block.shape[2])
+
+
+def _resolve_windows(length, windows=None):
+    # Windows of the time series as a list of (start, end) positions, from \
+    # the windows, window and step parameters of sits2metrics
+    if windows is None:
+        return None
+
+    windows, window, step = windows
+
+    if windows is None:
+        step = window if step is None else step
+        windows = [(start, start + window)
+                   for start in range(0, length - window + 1, step)]
+
+    windows = [(int(start), int(end)) for start, end in windows]
+
+    if not windows:
+        raise ValueError("No window fits in the time series.")
+
+    for start, end in windows:
+        if not 0 <= start < end <= length:
+            raise ValueError("Invalid window: " + str((start, end)))
+
+    return windows
+
+
+def _compute_from_xarray(dataset, metrics=METRICS_DICT, num_cores=-1,
+                         dtype="float64", windows=None):
+    # Metrics of each data variable, added as a new variable with a \
+    # metric dimension (and a window dimension, if windows are informed). \
+    # Variables backed by dask are computed lazily, chunk by chunk.
     import xarray
-    from .utils import list_metrics
 
-    band_list = list(dataset.data_vars)
+    names = _metrics_names(metrics)
 
-    metrics = xarray.Dataset()
+    band_list = list(dataset.data_vars)
 
     for key in band_list:
+        data = dataset[key]
 
-        series = numpy.squeeze(dataset[key].values)
+        # Drop single dimensions besides the spatial ones
+        single = [d for d in data.dims
+                  if d not in ("y", "x") and data.sizes[d] == 1]
+        data = data.squeeze(single, drop=True)
 
-        metricas = _sits2metrics(series, metrics, num_cores)
+        time = [d for d in data.dims if d not in ("y", "x")][0]
 
-        metrics_list = list_metrics()
+        if data.chunks is not None:
+            # Time must be in a single chunk, parallelism comes from dask. \
+            # The metrics hold the GIL, so the chunks only run in parallel \
+            # with a process based scheduler or a distributed client.
+            data = data.chunk({time: -1})
+            cores = 1
+        else:
+            cores = num_cores
 
-        lista = []
+        spans = _resolve_windows(data.sizes[time], windows)
 
-        for m, m_name in zip(range(0, metricas.shape[0]), metrics_list):
-            c = xarray.DataArray(metricas[m, :, :],
-                                 dims=['y', 'x'],
-                                 coords={'y': dataset.coords['y'],
-                                         'x': dataset.coords['x']})
+        dims, sizes = ["metric"], {"metric": len(names)}
+        if spans is not None:
+            dims, sizes["window"] = ["window", "metric"], len(spans)
 
-            c.coords['metric'] = m_name
+        metricas = xarray.apply_ufunc(
+            _ufunc_metrics, data,
+            input_core_dims=[[time]],
+            output_core_dims=[dims],
+            dask="parallelized",
+            output_dtypes=[numpy.dtype(dtype)],
+            dask_gufunc_kwargs={"output_sizes": sizes},
+            kwargs={"metrics_dict": metrics, "num_cores": cores,
+                    "dtype": dtype, "windows": spans})
 
-            lista.append(c)
+        metricas.coords["metric"] = names
 
-        dataset[key+'_metrics'] = xarray.concat(lista, dim='metric')
+        if spans is not None:
+            metricas.coords["window_start"] = ("window",
+                                               [s for s, _ in spans])
+            metricas.coords["window_end"] = ("window", [e for _, e in spans])
 
-    band_list = None
-    lista = None
+        dataset[key + '_metrics'] = metricas.transpose(*dims, ...)
 
     return dataset
+
+
+def _ufunc_metrics(array, metrics_dict=METRICS_DICT, num_cores=-1,
+                   dtype="float64", windows=None):
+    # Metrics of an array with time in the last axis, returned with the \
+    # metrics (and windows) in the last axes
+    shape = array.shape[:-1]
+
+    image = array.reshape(1, -1, array.shape[-1]).transpose(2, 0, 1)
+
+    if image.shape[2] == 0:
+        layers = (len(_metrics_names(metrics_dict)),)
+        if windows is not None:
+            layers = (len(windows),) + layers
+        metricas = numpy.empty(layers + (1, 0), dtype=dtype)
+    else:
+        metricas = _sits2metrics(image, metrics_dict, num_cores, None, dtype,
+                                 windows)
+
+    layers = metricas.shape[:-2]
+    metricas = metricas.reshape(layers + (image.shape[2],))
+
+    return numpy.moveaxis(metricas, -1, 0).reshape(shape + layers)
@@ -1,5 +1,6 @@
 import numpy
-from .utils import fixseries, truncate, create_polygon, get_list_of_points
+from .utils import fixseries, truncate, create_polygon, get_list_of_points, \
+    prepare
 
 
 def ts_polar(timeseries, funcs=["all"], nodata=-9999, show=False):
@@ -37,7 +38,7 @@ def ts_polar(timeseries, funcs=["all"], nodata=-9999, show=False):
      show=True)
 
     :param timeseries: Time series.
-    :type timeseries: numpy.ndarray
+    :type timeseries: numpy.ndarray or PreparedSeries
 
     :param nodata: nodata of the time series. Default is -9999.
     :type nodata: int
@@ -58,6 +59,9 @@ def ts_polar(timeseries, funcs=["all"], nodata=-9999, show=False):
 
     metrics_count = 9
 
+    # prepare time series once for all metrics
+    timeseries = prepare(timeseries, nodata)
+
     if "all" in funcs:
         funcs = [
             'area_ts',
@@ -74,7 +78,7 @@ def ts_polar(timeseries, funcs=["all"], nodata=-9999, show=False):
 
     for f in funcs:
         try:
-            out_metrics[f] = eval(f)(timeseries, nodata)
+            out_metrics[f] = METRICS[f][0](timeseries, nodata)
         except:
             out_metrics[f] = numpy.nan
 
@@ -84,6 +88,195 @@ def ts_polar(timeseries, funcs=["all"], nodata=-9999, show=False):
     return out_metrics
 
 
+def ts_polar_batch(matrix, funcs=["all"], nodata=-9999, check=False):
+    """This function computes polar metrics for every time series of a \
+    matrix in a single call, without building Shapely geometries.
+
+    The metrics are computed analytically from the vertices of the polar \
+    representation using ``polar_geometry``. The supported metrics are:
+
+    - Area - Area of the closed shape.
+
+    - Angle - The main angle of the closed shape created after transformation.
+
+    - Gyration_radius - Distance between the shape's first vertex and \
+    its centroid, as measured by ``gyration_radius``.
+
+    - CSI - Cell Shape Index.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param funcs: List of polar metrics to be computed. Default is all \
+    supported metrics.
+    :type funcs: list
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :param check: If True, the results are compared with the Shapely \
+    based metrics of ``ts_polar`` and an exception is raised if they differ.
+    :type check: boolean
+
+    :returns: Numpy array of metrics (metrics x pixels), following the \
+    order of ``funcs``.
+    """
+    import warnings
+    from .utils import fixseries_batch, check_input_batch, truncate_array
+
+    if "all" in funcs:
+        funcs = ['area_ts', 'angle', 'gyration_radius', 'csi']
+
+    for f in funcs:
+        if f not in ['area_ts', 'angle', 'gyration_radius', 'csi']:
+            raise ValueError("Polar metric not available in batch: " + f)
+
+    valid = check_input_batch(matrix)
+    ts = fixseries_batch(matrix, nodata)
+    ts[~valid] = numpy.nan
+
+    geometry = polar_geometry(ts)
+
+    out_metrics = numpy.full((len(funcs), ts.shape[0]), numpy.nan)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        for i, f in enumerate(funcs):
+            if f == 'area_ts':
+                values = geometry['area']
+            elif f == 'angle':
+                values = _batch_angle(ts)
+            elif f == 'gyration_radius':
+                values = numpy.hypot(geometry['first_x'] - geometry['centroid_x'],
+                                     geometry['first_y'] - geometry['centroid_y'])
+                # Shapes with many parts have no single exterior ring
+                values[geometry['parts'] != 1] = numpy.nan
+            elif f == 'csi':
+                values = geometry['perimeter'] ** 2 / \
+                    (4 * numpy.pi * geometry['area'])
+
+            out_metrics[i] = truncate_array(values)
+
+    if check is True:
+        _check_polar_batch(matrix, funcs, nodata, out_metrics)
+
+    return out_metrics
+
+
+def polar_geometry(matrix):
+    """This function computes the geometry of the polar representation of \
+    every time series of a matrix, using vectorized shoelace formulas.
+
+    The vertices are the same used by ``create_polygon``, where the \
+    observation ``i`` of a time series of length ``N`` is placed at the \
+    angle ``2*pi*i/N``. As the angles increase monotonically, the polygon \
+    is star-shaped around the origin and no Shapely operation is needed.
+
+    :param matrix: Matrix of time series (pixels x time) already fixed by \
+    ``fixseries_batch``, where each row is padded with NaN at the end.
+    :type matrix: numpy.ndarray
+
+    :returns geometry: Dictionary of numpy arrays with the area, \
+    perimeter, centroid (centroid_x and centroid_y), first vertex \
+    (first_x and first_y) and number of parts of each polygon. Rows with \
+    less than 5 observations or only zeros receive NaN, as in \
+    ``create_polygon``.
+    """
+    matrix = numpy.array(matrix, dtype=float, ndmin=2)
+
+    # create_polygon fixes the time series using the default nodata
+    matrix[matrix == -9999] = numpy.nan
+
+    count = numpy.sum(~numpy.isnan(matrix), axis=1)
+    n = numpy.maximum(count, 1)[:, None]
+    idx = numpy.arange(matrix.shape[1])[None, :]
+    inside = idx < count[:, None]
+
+    # Vertices of the polygon
+    radius = numpy.where(inside, numpy.abs(matrix), 0)
+    theta = 2 * numpy.pi * idx / n
+    x = radius * numpy.cos(theta)
+    y = radius * numpy.sin(theta)
+
+    # Next and previous vertices, closing the ring of each row
+    nxt = numpy.where(idx + 1 < count[:, None], idx + 1, 0)
+    nxt = numpy.broadcast_to(nxt, x.shape)
+    prv = numpy.where(idx == 0, count[:, None] - 1, idx - 1)
+    prv = numpy.broadcast_to(numpy.maximum(prv, 0), x.shape)
+    x1 = numpy.take_along_axis(x, nxt, axis=1)
+    y1 = numpy.take_along_axis(y, nxt, axis=1)
+
+    cross = numpy.where(inside, x * y1 - x1 * y, 0)
+    edges = numpy.where(inside, numpy.hypot(x1 - x, y1 - y), 0)
+
+    # Vertices at the origin split the shape into parts. A single vertex \
+    # between two of them is a spike with no area, which is dropped by \
+    # buffer(0) in create_polygon, so its edges are not part of the shape.
+    zero = radius == 0
+    zero_prv = numpy.take_along_axis(zero, prv, axis=1)
+    zero_nxt = numpy.take_along_axis(zero, nxt, axis=1)
+    spikes = inside & ~zero & zero_prv & zero_nxt
+    parts = numpy.sum(inside & ~zero & zero_prv & ~zero_nxt, axis=1)
+    parts = numpy.where(numpy.any(inside & zero, axis=1), parts, 1)
+
+    area = cross.sum(axis=1) / 2
+    perimeter = edges.sum(axis=1) - 2 * numpy.sum(radius * spikes, axis=1)
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        cx = ((x + x1) * cross).sum(axis=1) / (6 * area)
+        cy = ((y + y1) * cross).sum(axis=1) / (6 * area)
+
+    geometry = {'area': area,
+                'perimeter': perimeter,
+                'centroid_x': cx,
+                'centroid_y': cy,
+                'first_x': numpy.where(spikes[:, 0], 0, x[:, 0]),
+                'first_y': numpy.where(spikes[:, 0], 0, y[:, 0]),
+                'parts': parts}
+
+    # create_polygon checks the input again, requiring 5 observations \
+    # that are not all zeros
+    valid = (count >= 5) & numpy.any(inside & ~zero, axis=1)
+    for key in geometry:
+        geometry[key] = numpy.where(valid, geometry[key], numpy.nan)
+
+    return geometry
+
+
+def _batch_angle(ts):
+    # Angle of the maximum radius, using the angles of get_list_of_points
+    count = numpy.sum(~numpy.isnan(ts), axis=1)
+    pos = numpy.argmax(numpy.where(numpy.isnan(ts), -numpy.inf,
+                                   numpy.abs(ts)), axis=1)
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        values = pos * (2 * numpy.pi / (count - 1))
+
+    values[pos == count - 1] = 2 * numpy.pi
+    values[count == 1] = 0
+    values[count == 0] = numpy.nan
+
+    return values
+
+
+def _check_polar_batch(matrix, funcs, nodata, out_metrics):
+    # Compare batch results with the Shapely based metrics
+    matrix = numpy.array(matrix, dtype=float, ndmin=2)
+
+    for p in range(matrix.shape[0]):
+        reference = ts_polar(matrix[p].copy(), funcs, nodata)
+        expected = numpy.array([reference[f] for f in funcs], dtype=float)
+
+        agree = numpy.isclose(expected, out_metrics[:, p], atol=1e-5,
+                              equal_nan=True)
+
+        if not agree.all():
+            wrong = [f for f, a in zip(funcs, agree) if not a]
+            raise ValueError("Batch polar metrics differ from Shapely for "
+                             "pixel " + str(p) + ": " + ", ".join(wrong))
+
+
 def symmetric_distance(time_series_1, time_series_2, nodata=-9999):
     """This function computes the difference between two time series \
     in the polar space.
@@ -99,10 +292,6 @@ def symmetric_distance(time_series_1, time_series_2, nodata=-9999):
 
     :returns dist: Distance between two time series.
     """
-    # setting up initial distance
-    dist = numpy.inf
-    pos = numpy.inf
-
     time_series_1[time_series_1 == nodata] = numpy.nan
     time_series_1 = time_series_1[~numpy.isnan(time_series_1)]
 
@@ -125,16 +314,8 @@ def symmetric_distance(time_series_1, time_series_2, nodata=-9999):
         poly_sym_difference = polygon_1.symmetric_difference(polygon_2)
         dist = poly_sym_difference.area
     else:
-        for i in range(len(time_series_1)):
-            shifted_time_series_2 = numpy.roll(time_series_2, i)
-
-            # linalg.norm is efficient way to approximate series
-            temp = numpy.linalg.norm(time_series_1 - shifted_time_series_2)
-
-            # save the minimum distance
-            if temp < dist:
-                dist = temp
-                pos = i
+        # find the shift that best aligns the series
+        pos = best_rotation(time_series_1, time_series_2)[0]
 
         # roll time series
         time_series_2 = numpy.roll(time_series_2, pos)
@@ -148,6 +329,266 @@ def symmetric_distance(time_series_1, time_series_2, nodata=-9999):
     return truncate(dist)
 
 
+def symmetric_distance_batch(time_series, candidates, nodata=-9999):
+    """This function computes the difference in the polar space between \
+    one time series and each time series of a matrix of candidates.
+
+    The optimal alignment of all candidates is found in a single batched \
+    call of ``best_rotation`` and the polygon of the reference time series \
+    is created only once. Candidates for which ``symmetric_distance`` \
+    would fail receive NaN.
+
+    :param time_series: Reference time series.
+    :type time_series: numpy.ndarray
+
+    :param candidates: Matrix of time series (candidates x time).
+    :type candidates: numpy.ndarray
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :returns dist: Numpy array of distances between the reference and \
+    each candidate.
+    """
+    from .utils import fixseries_batch, check_input_batch
+
+    reference = numpy.array(time_series, dtype=float)
+    reference[reference == nodata] = numpy.nan
+    reference = fixseries(reference[~numpy.isnan(reference)])
+
+    # create polygon
+    polygon_1 = create_polygon(reference).buffer(0)
+
+    candidates = numpy.array(candidates, dtype=float, ndmin=2)
+    candidates[candidates == nodata] = numpy.nan
+    candidates = fixseries_batch(candidates)
+
+    count = numpy.sum(~numpy.isnan(candidates), axis=1)
+    valid = check_input_batch(candidates) & (count >= 5)
+
+    dist = numpy.full(candidates.shape[0], numpy.nan)
+
+    with numpy.errstate(invalid='ignore'):
+        minimum = numpy.nanmin(numpy.where(valid[:, None], candidates,
+                                           numpy.inf), axis=1)
+        maximum = numpy.nanmax(numpy.where(valid[:, None], candidates,
+                                           -numpy.inf), axis=1)
+
+    # Check if one polygon is completly inside other, if not roll
+    inside = (reference.min() > maximum) | (minimum > reference.max())
+    rolling = valid & ~inside & (count == reference.shape[0])
+
+    shifts = numpy.zeros(candidates.shape[0], dtype=int)
+    if rolling.any():
+        shifts[rolling] = best_rotation(
+            reference, candidates[rolling, :reference.shape[0]])
+
+    for p in numpy.where(valid & (inside | rolling))[0]:
+        try:
+            serie = numpy.roll(candidates[p, :count[p]], shifts[p])
+
+            polygon_2 = create_polygon(serie).buffer(0)
+
+            # compute symmetric difference of time series
+            poly_sym_difference = polygon_1.symmetric_difference(polygon_2)
+            dist[p] = truncate(poly_sym_difference.area)
+        except:
+            dist[p] = numpy.nan
+
+    return dist
+
+
+def symmetric_distance_matrix(series_matrix, nodata=-9999, num_cores=-1,
+                              square=False):
+    """This function computes the difference in the polar space between \
+    every pair of time series of a matrix, using multiprocessing.
+
+    As the distance is symmetric, only the pairs above the diagonal are \
+    computed. The polygon of each time series is created only once per \
+    worker and is rotated to the optimal alignment found by \
+    ``best_rotation``, instead of being created again for every pair. \
+    Pairs for which ``symmetric_distance`` would fail receive NaN.
+
+    :param series_matrix: Matrix of time series (series x time).
+    :type series_matrix: numpy.ndarray
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :param num_cores: Number of cores to be used. \
+    Value -1 means all cores available.
+    :type num_cores: integer
+
+    :param square: If True, a square matrix of distances is returned. \
+    Otherwise, the condensed distance vector used by \
+    ``scipy.spatial.distance`` and ``scipy.cluster.hierarchy`` is returned.
+    :type square: boolean
+
+    :returns dist: Numpy array of distances.
+    """
+    import multiprocessing as mp
+
+    series_matrix = numpy.array(series_matrix, dtype=float, ndmin=2)
+    n = series_matrix.shape[0]
+
+    # filtering timeseries
+    series = []
+    for serie in series_matrix:
+        serie = serie.copy()
+        serie[serie == nodata] = numpy.nan
+        try:
+            series.append(fixseries(serie[~numpy.isnan(serie)]))
+        except:
+            series.append(None)
+
+    # Split rows in blocks with a similar number of pairs
+    if num_cores == -1:
+        num_cores = mp.cpu_count()
+    elif num_cores == 0:
+        num_cores = 1
+
+    pairs = numpy.cumsum(numpy.arange(n - 1, -1, -1))
+    nblocks = max(min(num_cores * 4, n), 1)
+    limits = numpy.linspace(0, pairs[-1] if n > 0 else 0, nblocks + 1)
+    limits = numpy.searchsorted(pairs, limits[1:-1])
+    blocks = [b for b in numpy.split(numpy.arange(n), numpy.unique(limits))
+              if b.size > 0]
+
+    if num_cores == 1:
+        _init_distance_worker(series)
+        parts = [_distance_block(b) for b in blocks]
+    else:
+        pool = mp.Pool(num_cores, initializer=_init_distance_worker,
+                       initargs=(series,))
+        parts = pool.map(_distance_block, blocks)
+        pool.close()
+
+    dist = numpy.concatenate(parts) if parts else numpy.array([])
+
+    if square is True:
+        out = numpy.zeros((n, n))
+        out[numpy.triu_indices(n, 1)] = dist
+        return out + out.T
+
+    return dist
+
+
+_DISTANCE_SERIES = []
+_DISTANCE_POLYGONS = dict()
+
+
+def _init_distance_worker(series):
+    # Share the fixed time series with the worker and reset its polygons
+    global _DISTANCE_SERIES
+    _DISTANCE_SERIES = series
+    _DISTANCE_POLYGONS.clear()
+
+
+def _distance_polygon(i):
+    # Polygon of a time series, created once per worker
+    if i not in _DISTANCE_POLYGONS:
+        try:
+            polygon = create_polygon(_DISTANCE_SERIES[i]).buffer(0)
+        except:
+            polygon = None
+        _DISTANCE_POLYGONS[i] = polygon
+
+    return _DISTANCE_POLYGONS[i]
+
+
+def _distance_block(rows):
+    # Distances between each row of the block and the following rows
+    from shapely import affinity
+
+    series = _DISTANCE_SERIES
+    n = len(series)
+    out = []
+
+    for i in rows:
+        dist = numpy.full(n - i - 1, numpy.nan)
+        ts1 = series[i]
+        polygon_1 = _distance_polygon(i)
+
+        if ts1 is None or polygon_1 is None:
+            out.append(dist)
+            continue
+
+        others = [j for j in range(i + 1, n) if series[j] is not None]
+
+        # Check if one polygon is completly inside other
+        inside = [j for j in others
+                  if ts1.min() > series[j].max() or
+                  series[j].min() > ts1.max()]
+        rolling = [j for j in others
+                   if j not in inside and len(series[j]) == len(ts1)]
+
+        shifts = dict.fromkeys(inside, 0)
+        if rolling:
+            shifts.update(zip(rolling, best_rotation(
+                ts1, numpy.vstack([series[j] for j in rolling]))))
+
+        for j, shift in shifts.items():
+            polygon_2 = _distance_polygon(j)
+            if polygon_2 is None:
+                continue
+
+            # rolling the series rotates its polygon around the origin
+            if shift != 0:
+                polygon_2 = affinity.rotate(polygon_2,
+                                            360 * shift / len(series[j]),
+                                            origin=(0, 0))
+
+            try:
+                poly_sym_difference = polygon_1.symmetric_difference(polygon_2)
+                dist[j - i - 1] = truncate(poly_sym_difference.area)
+            except:
+                pass
+
+        out.append(dist)
+
+    return numpy.concatenate(out) if out else numpy.array([])
+
+
+def best_rotation(time_series, candidates):
+    """This function finds the circular shift of each candidate that best \
+    aligns it to the time series, i.e. the shift ``i`` that minimizes \
+    ``numpy.linalg.norm(time_series - numpy.roll(candidate, i))``.
+
+    Instead of testing every shift, the distances of all shifts are \
+    obtained from the circular cross-correlation computed with the Fast \
+    Fourier Transform, in O(n log n) for each candidate. If two shifts \
+    are equally good, the smallest one is returned.
+
+    :param time_series: Reference time series.
+    :type time_series: numpy.ndarray
+
+    :param candidates: Time series or matrix of time series \
+    (candidates x time) to be aligned.
+    :type candidates: numpy.ndarray
+
+    :returns shifts: Numpy array with the best shift of each candidate.
+    """
+    time_series = numpy.asarray(time_series, dtype=float)
+    candidates = numpy.array(candidates, dtype=float, ndmin=2)
+
+    n = time_series.shape[0]
+
+    if candidates.shape[1] != n:
+        raise ValueError("The time series must have the same length.")
+
+    # circular cross-correlation of the reference with all candidates
+    spectrum = numpy.fft.rfft(time_series)[None, :] * \
+        numpy.conj(numpy.fft.rfft(candidates, axis=1))
+    correlation = numpy.fft.irfft(spectrum, n, axis=1)
+
+    # ||a - roll(b, i)||^2 = ||a||^2 + ||b||^2 - 2 * correlation[i]
+    energy = numpy.sum(time_series ** 2) + numpy.sum(candidates ** 2, axis=1)
+    tolerance = 1e-9 * numpy.maximum(energy, 1)[:, None]
+    best = correlation >= correlation.max(axis=1)[:, None] - tolerance
+
+    return numpy.argmax(best, axis=1)
+
+
 def polar_plot(timeseries, nodata=-9999):
     """This function create a plot of time series in polar space.
 
@@ -163,10 +604,8 @@ def polar_plot(timeseries, nodata=-9999):
     from descartes import PolygonPatch
     from matplotlib.ticker import FormatStrFormatter
 
-    # filter time series
-    ts = fixseries(timeseries, nodata)
-    # create polygon
-    polygon = create_polygon(ts)
+    # get polygon of the time series
+    polygon = prepare(timeseries, nodata).polygon
     # get polygon coords
     x, y = polygon.envelope.exterior.coords.xy
     minX = -numpy.max(numpy.abs(x))
@@ -269,11 +708,20 @@ def area_season(timeseries, nodata=-9999):
     :return area: The area of the time series that intersected each \
     quadrant that represents a season.
     """
-    # fix time series
-    ts = fixseries(timeseries, nodata)
-    # create polygon
+    # polygons are computed once and shared by the prepared time series
+    return prepare(timeseries, nodata).seasons
+
+
+def season_polygons(polygon):
+    """This function computes the intersection of the polar representation \
+    of a time series with the four quadrant polygons of ``get_seasons``.
 
-    polygon = create_polygon(ts)
+    :param polygon: Polygon of the time series in polar space.
+    :type polygon: shapely.geometry.Polygon
+
+    :return seasons: Tuple with the polygons of the time series in each \
+    quadrant (top left, top right, bottom left and bottom right).
+    """
     polygon = polygon.buffer(0)
 
     # get polygon coords
@@ -372,10 +820,8 @@ def ecc_metric(timeseries, nodata=-9999):
     transformation.
     """
 
-    # filter time series
-    ts = fixseries(timeseries, nodata)
-    # create polygon
-    polygon = create_polygon(ts)
+    # get polygon of the time series
+    polygon = prepare(timeseries, nodata).polygon
     # get MRR
     rrec = polygon.minimum_rotated_rectangle
     minx, miny, maxx, maxy = rrec.bounds
@@ -400,7 +846,7 @@ def angle(timeseries, nodata=-9999):
     """
 
     # filter time series
-    ts = fixseries(timeseries, nodata)
+    ts = prepare(timeseries, nodata).series
 
     # get polar transformation info
     list_of_radius, list_of_angles = get_list_of_points(ts)
@@ -422,10 +868,8 @@ def gyration_radius(timeseries, nodata=-9999):
     inside the shape and the shape’s centroid.
     """
 
-    # filtered time series
-    ts = fixseries(timeseries, nodata)
-    # create polygon
-    polygon = create_polygon(ts)
+    # get polygon of the time series
+    polygon = prepare(timeseries, nodata).polygon
     # get polygon centroids
     lonc, latc = polygon.centroid.xy
     # get polygon exterior coords
@@ -453,10 +897,8 @@ def polar_balance(timeseries, nodata=-9999):
     :return polar_balance:  Standard deviation of the areas per season.
     """
 
-    # filter time series
-    ts = fixseries(timeseries, nodata)
     # get area season
-    a1, a2, a3, a4 = area_season(ts)
+    a1, a2, a3, a4 = area_season(prepare(timeseries, nodata))
     return truncate(numpy.std([a1.area, a2.area, a3.area, a4.area]))
 
 
@@ -472,10 +914,8 @@ def area_ts(timeseries, nodata=-9999):
     :return area_ts: Area of polygon.
     """
 
-    # fix time series
-    ts = fixseries(timeseries, nodata)
-    # create polygon
-    polygon = create_polygon(ts)
+    # get polygon of the time series
+    polygon = prepare(timeseries, nodata).polygon
 
     return truncate(polygon.area)
 
@@ -501,8 +941,21 @@ def csi(timeseries, nodata=-9999):
         That's why cell shape index is available here.
     """
 
-    # filter time series
-    ts = fixseries(timeseries, nodata)
-    # create polygon
-    polygon = create_polygon(ts).buffer(0)
+    # get polygon of the time series
+    polygon = prepare(timeseries, nodata).polygon.buffer(0)
     return truncate((polygon.length ** 2)/(4 * numpy.pi * polygon.area))
+
+
+# Metrics of the module and the intermediates of PreparedSeries they use
+METRICS = {
+    'area_ts': (area_ts, ['polygon']),
+    'angle': (angle, ['series']),
+    'area_q1': (area_q1, ['seasons']),
+    'area_q2': (area_q2, ['seasons']),
+    'area_q3': (area_q3, ['seasons']),
+    'area_q4': (area_q4, ['seasons']),
+    'polar_balance': (polar_balance, ['seasons']),
+    'ecc_metric': (ecc_metric, ['polygon']),
+    'gyration_radius': (gyration_radius, ['polygon']),
+    'csi': (csi, ['polygon']),
+}
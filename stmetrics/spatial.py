@@ -6,7 +6,8 @@ from numba import njit, prange
 
 def snitc(dataset, ki, m, nodata=0, scale=10000, iter=10, pattern="hexagonal",
           output="shp", window=None, max_dist=None, max_step=None, 
-          max_diff=None, penalty=None, psi=None, pruning=False):
+          max_diff=None, penalty=None, psi=None, pruning=True,
+          dtype="float64", num_cores=-1, tol=None):
     """This function create spatial-temporal superpixels using a Satellite \
     Image Time Series (SITS). Version 1.4
 
@@ -54,6 +55,29 @@ def snitc(dataset, ki, m, nodata=0, scale=10000, iter=10, pattern="hexagonal",
 
     :param psi: Psi relaxation parameter (ignore start and end of matching). \
     Useful for cyclical series.
+
+    :param pruning: Skip the DTW of pixels whose lower bound (LB_Kim and \
+    LB_Keogh against the cluster mean series) plus the spatial term can \
+    not beat their current distance. The labels are the same, and the \
+    fraction of pixels pruned is printed. Default is True.
+    :type pruning: boolean
+
+    :param dtype: Floating point type of the normalized image. float32 \
+    halves the memory used by the image and the cluster centres.
+    :type dtype: string
+
+    :param num_cores: Number of threads of the assignment step. Clusters \
+    whose search windows do not overlap are assigned at the same time, \
+    with the same labels of the sequential algorithm. \
+    Value -1 means all cores available.
+    :type num_cores: integer
+
+    :param tol: Stop before ``iter`` iterations when the fraction of \
+    pixels that changed label in an iteration is not larger than this \
+    value. With 0, it stops once the labels are stable, which gives the \
+    same segmentation of running all iterations. Default runs all \
+    iterations.
+    :type tol: float
     
     :returns segmentation: Segmentation produced.
 
@@ -65,14 +89,6 @@ def snitc(dataset, ki, m, nodata=0, scale=10000, iter=10, pattern="hexagonal",
     """
     print('Simple Non-Linear Iterative Temporal Clustering V 1.4')
 
-    fast = False
-    try:
-        from dtaidistance.dtw import dtw_cc_omp
-        fast = True
-    except ImportError:
-        logger.debug('DTAIDistance C-OMP library not available')
-        fast = False
-
     if isinstance(dataset, rasterio.io.DatasetReader):
         try:
             # READ FILE
@@ -94,6 +110,39 @@ def snitc(dataset, ki, m, nodata=0, scale=10000, iter=10, pattern="hexagonal",
         TypeError("Sorry we can't read this type of file. \
                   Please use Rasterio or xarray")
 
+    settings = _dtw_settings(window, max_dist, max_step, penalty, psi)
+
+    labelled, used, compared, pruned = _snitc(img, ki, m, nodata, scale,
+                                              iter, pattern, settings,
+                                              pruning, dtype, num_cores, tol)
+
+    print('Iterations: {} of {}'.format(used, iter))
+    if pruning:
+        print('DTW pruned: {:.1%} of {} pixel comparisons'.format(
+            pruned / max(compared, 1), compared))
+
+    if output == "shp":
+        segmentation = write_pandas(labelled, transform, crs)
+        return segmentation
+    else:
+        # Return labeled numpy.array for visualization on python
+        return labelled
+
+
+def _snitc(img, ki, m, nodata=0, scale=10000, iter=10, pattern="hexagonal",
+           settings=None, pruning=True, dtype="float64", num_cores=-1,
+           tol=None):
+    # Segmentation of an image (bands x rows x columns) in memory. Returns \
+    # the labels, the iterations used, and the pixels compared and pruned \
+    # in the assignment steps.
+    import numba
+
+    if settings is None:
+        settings = _dtw_settings()
+
+    # Integer images must be converted before normalization
+    img = img.astype(dtype, copy=False)
+
     # Normalize data
     for band in range(img.shape[0]):
         img[numpy.isnan(img)] = nodata
@@ -112,64 +161,301 @@ def snitc(dataset, ki, m, nodata=0, scale=10000, iter=10, pattern="hexagonal",
         print("Unknow patter. We are using hexagonal")
         C, S, l, d, k = init_cluster_hex(rows, columns, ki, img, bands)
 
-    # Start clustering
-    for n in range(iter):
-
-        for kk in prange(k):
-            # Get subimage around cluster
-            rmin = int(numpy.floor(max(C[kk, bands]-S, 0)))
-            rmax = int(numpy.floor(min(C[kk, bands]+S, rows))+1)
-            cmin = int(numpy.floor(max(C[kk, bands+1]-S, 0)))
-            cmax = int(numpy.floor(min(C[kk, bands+1]+S, columns))+1)
-
-            # Create subimage 2D numpy.array
-            subim = img[:, rmin:rmax, cmin:cmax]
-
-            # get cluster centres
-            # Average time series
-            c_series = C[kk, :subim.shape[0]]
-            # X-coordinate
-            ic = int(numpy.floor(C[kk, subim.shape[0]])) - rmin
-            # Y-coordinate
-            jc = int(numpy.floor(C[kk, subim.shape[0]+1])) - cmin
-
-            # Calculate Spatio-temporal distance
-            try:
-                D = distance_fast(c_series, ic, jc, subim, S, m, rmin, cmin, 
-                                  window=window, max_dist=max_dist,
-                                  max_step=max_step, 
-                                  max_diff=max_diff,
-                                  penalty=penalty, psi=psi)
-            except:
-                D = distance(c_series, ic, jc, subim, S, m, rmin, cmin, 
-                                  window=window, max_dist=max_dist,
-                                  max_step=max_step, 
-                                  max_diff=max_diff,
-                                  penalty=penalty, psi=psi)  # DTW regular
-
-            subd = d[rmin:rmax, cmin:cmax]
-            subl = l[rmin:rmax, cmin:cmax]
-
-            # Check if Distance from new cluster is smaller than previous
-            subl = numpy.where(D < subd, kk, subl)
-            subd = numpy.where(D < subd, D, subd)
-
-            # Replace the pixels that had smaller difference
-            d[rmin:rmax, cmin:cmax] = subd
-            l[rmin:rmax, cmin:cmax] = subl
-
-        # Update Clusters
-        C = update_cluster(img, l, rows, columns, bands, k)
+    # Iteration in which each label was set
+    it = numpy.full(l.shape, -1)
+
+    if num_cores == -1:
+        num_cores = numba.config.NUMBA_NUM_THREADS
+    elif num_cores == 0:
+        num_cores = 1
+
+    threads = numba.get_num_threads()
+    numba.set_num_threads(min(num_cores, numba.config.NUMBA_NUM_THREADS))
+
+    try:
+        # Start clustering
+        used = 0
+        compared = pruned = 0
+        for n in range(iter):
+            used = n + 1
+            previous = l.copy()
+
+            # Clusters of a group have disjoint windows and run in parallel
+            for clusters in _cluster_groups(C, bands, S):
+                stats = _assign_clusters(img, C, clusters, S, m, d, l, it, n,
+                                         pruning, *settings)
+                compared += stats[0]
+                pruned += stats[1]
+
+            # Stop when the segmentation converged
+            changed = numpy.count_nonzero(l != previous) / l.size
+            if tol is not None and changed <= tol:
+                break
+
+            # Update Clusters
+            C = update_cluster(img, l, rows, columns, bands, k)
+    finally:
+        numba.set_num_threads(threads)
 
     # Remove noise from segmentation
     labelled = postprocessing(l, S)
 
-    if output == "shp":
-        segmentation = write_pandas(labelled, transform, crs)
-        return segmentation
+    return labelled, used, compared, pruned
+
+
+def snitc2raster(dataset, path, ki, m, tile_size=1024, overlap=None,
+                 num_cores=-1, output="tif", nodata=0, scale=10000, iter=10,
+                 pattern="hexagonal", window=None, max_dist=None,
+                 max_step=None, penalty=None, psi=None, pruning=True,
+                 dtype="float64", tol=None):
+    """This function segments a rasterio dataset with SNITC tile by tile \
+    and writes the labels in a single band GeoTIFF.
+
+    The image is never read as a whole. The scene is split in square \
+    tiles, that are read with an overlap around them and segmented \
+    independently by the workers. Superpixels that cross a seam are \
+    matched in the overlap of the neighbouring tiles and receive the \
+    same label. The memory used depends only on the size of the tiles.
+
+    :param dataset: SITS image. Each band is a date.
+    :type dataset: rasterio dataset or path to the image
+
+    :param path: Path of the output image.
+    :type path: string
+
+    :param ki: Number or desired superpixels in the whole scene.
+    :type ki: int
+
+    :param m: Compactness value. Bigger values led to regular superpixels.
+    :type m: int
+
+    :param tile_size: Size of the square tiles. Default is 1024.
+    :type tile_size: integer
+
+    :param overlap: Number of pixels read around each tile and used to \
+    match the superpixels of neighbouring tiles. Default is the spacing \
+    between superpixels.
+    :type overlap: integer
+
+    :param num_cores: Number of cores to be used, each one segmenting a \
+    tile. Value -1 means all cores available.
+    :type num_cores: integer
+
+    :param output: Type of output to be produced. Default is tif, that \
+    returns the path of the image. With shp, the polygons of the \
+    superpixels are returned as a geopandas geodataframe.
+    :type output: string
+
+    :param tol: Stop the segmentation of a tile when the fraction of \
+    pixels that changed label in an iteration is not larger than this value.
+    :type tol: float
+
+    The other parameters are the same of ``snitc``.
+
+    :returns segmentation: Path of the image with the labels, or the \
+    polygons of the superpixels.
+    """
+    import rasterio
+    import multiprocessing as mp
+    from rasterio.windows import Window
+    from .metrics import _check_blocks, _init_raster_worker
+
+    if isinstance(dataset, rasterio.io.DatasetReader):
+        src_path = dataset.name
     else:
-        # Return labeled numpy.array for visualization on python
-        return labelled
+        src_path = dataset
+
+    with rasterio.open(src_path) as src:
+        profile = src.profile.copy()
+        rows, columns = src.height, src.width
+
+    # Spacing of the superpixels in the scene
+    S = (rows * columns / (ki * (3**0.5)/2))**0.5
+    if overlap is None:
+        overlap = int(numpy.ceil(S))
+
+    profile.update(driver="GTiff", count=1, dtype="int32", nodata=None,
+                   tiled=True, blockxsize=256, blockysize=256)
+
+    # A strip left at the end of the scene too thin to seed superpixels \
+    # is merged in the previous tile
+    minimum = max(overlap, int(numpy.ceil(2 * S)))
+
+    # Tiles in row-major order, with the core written in the output and \
+    # the extended window segmented
+    tiles = []
+    for ti, (r, height) in enumerate(_tile_spans(rows, tile_size, minimum)):
+        for tj, (c, width) in enumerate(_tile_spans(columns, tile_size,
+                                                    minimum)):
+            core = (c, r, width, height)
+            r0, c0 = max(r - overlap, 0), max(c - overlap, 0)
+            extended = (c0, r0,
+                        min(c + width + overlap, columns) - c0,
+                        min(r + height + overlap, rows) - r0)
+            tiles.append(((ti, tj), core, extended))
+
+    settings = _dtw_settings(window, max_dist, max_step, penalty, psi)
+
+    tasks = ((extended, max(int(round(ki * extended[2] * extended[3] /
+                                      (rows * columns))), 1),
+              m, nodata, scale, iter, pattern, settings, pruning, dtype, tol)
+             for _, _, extended in tiles)
+
+    num_cores, _ = _check_blocks(1, num_cores)
+
+    if num_cores == 1:
+        _init_raster_worker(src_path)
+        results = map(_snitc_tile, tasks)
+    else:
+        # Initialize pool. Workers are spawned, as the numba threads of \
+        # the segmentation do not survive a fork of a process that used them.
+        pool = mp.get_context("spawn").Pool(
+            num_cores, initializer=_init_raster_worker, initargs=(src_path,))
+        results = pool.imap(_snitc_tile, tasks)
+
+    # Union-find of the global labels, merged across the seams
+    parent = []
+
+    def find(label):
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    done = dict()
+
+    with rasterio.open(path, "w", **profile) as dst:
+        for (key, core, extended), labels in zip(tiles, results):
+            # Local labels to global labels
+            labels = labels.astype(numpy.int64) + len(parent)
+            parent.extend(range(len(parent), int(labels.max()) + 1))
+
+            # Match the superpixels in the overlap of the previous tiles
+            ti, tj = key
+            for near in [(ti, tj - 1), (ti - 1, tj - 1), (ti - 1, tj),
+                         (ti - 1, tj + 1)]:
+                if near in done:
+                    for a, b in _seam_matches(done[near], (extended,
+                                                           labels)):
+                        parent[find(b)] = find(a)
+
+            c0, r0 = core[0] - extended[0], core[1] - extended[1]
+            dst.write(labels[r0:r0 + core[3], c0:c0 + core[2]].astype(
+                numpy.int32)[None], window=Window(*core))
+
+            done[key] = (extended, labels)
+            for old in [k for k in done if k < (ti - 1, tj)]:
+                del done[old]
+
+    if num_cores != 1:
+        # Close pool
+        pool.close()
+    _init_raster_worker(None)
+
+    # Consecutive labels of the merged superpixels
+    roots = numpy.array([find(label) for label in range(len(parent))],
+                        dtype=numpy.int64)
+    _, lut = numpy.unique(roots, return_inverse=True)
+    lut = lut.astype(numpy.int32)
+
+    with rasterio.open(path, "r+") as dst:
+        for _, window in dst.block_windows(1):
+            dst.write(lut[dst.read(1, window=window)], 1, window=window)
+
+    if output == "shp":
+        return _raster_polygons(path)
+
+    return path
+
+
+def _tile_spans(size, tile_size, minimum):
+    # Start and size of the tiles along one axis. The remainder is merged \
+    # in the last tile if it is smaller than minimum.
+    starts = list(range(0, size, tile_size))
+    if len(starts) > 1 and size - starts[-1] < minimum:
+        del starts[-1]
+
+    return list(zip(starts, numpy.diff(starts + [size]).tolist()))
+
+
+def _snitc_tile(task):
+    # Read a tile with its overlap and segment it
+    from rasterio.windows import Window
+    from . import metrics
+
+    window, ki, m, nodata, scale, iter, pattern, settings, pruning, dtype, \
+        tol = task
+
+    img = metrics._RASTER.read(window=Window(*window))
+
+    labelled, _, _, _ = _snitc(img, ki, m, nodata, scale, iter, pattern,
+                               settings, pruning, dtype, 1, tol)
+
+    return labelled
+
+
+def _seam_matches(first, second):
+    # Pairs of labels of two tiles that are the same superpixel. In the \
+    # overlap of the tiles, each label is matched to the label of the other \
+    # tile that covers most of the smaller of them, if it covers at least \
+    # half of it.
+    (wa, la), (wb, lb) = first, second
+
+    c0, r0 = max(wa[0], wb[0]), max(wa[1], wb[1])
+    c1 = min(wa[0] + wa[2], wb[0] + wb[2])
+    r1 = min(wa[1] + wa[3], wb[1] + wb[3])
+
+    if c1 <= c0 or r1 <= r0:
+        return []
+
+    a = la[r0 - wa[1]:r1 - wa[1], c0 - wa[0]:c1 - wa[0]].ravel()
+    b = lb[r0 - wb[1]:r1 - wb[1], c0 - wb[0]:c1 - wb[0]].ravel()
+
+    pairs, counts = numpy.unique(numpy.stack([a, b]), axis=1,
+                                 return_counts=True)
+
+    sizes_a = dict(zip(*numpy.unique(a, return_counts=True)))
+    sizes_b = dict(zip(*numpy.unique(b, return_counts=True)))
+
+    best_a, best_b = dict(), dict()
+    for (label_a, label_b), count in zip(pairs.T, counts):
+        cover = count / min(sizes_a[label_a], sizes_b[label_b])
+        if cover >= 0.5:
+            if cover > best_a.get(label_a, (0, None))[0]:
+                best_a[label_a] = (cover, label_b)
+            if cover > best_b.get(label_b, (0, None))[0]:
+                best_b[label_b] = (cover, label_a)
+
+    return set([(label_a, label_b)
+                for label_a, (_, label_b) in best_a.items()] +
+               [(label_a, label_b)
+                for label_b, (_, label_a) in best_b.items()])
+
+
+def _raster_polygons(path):
+    # Polygons of the labels of an image, built block by block and \
+    # dissolved by label
+    import geopandas
+    import rasterio
+    import rasterio.features
+    from shapely.geometry import shape
+
+    labels, polygons = [], []
+
+    with rasterio.open(path) as src:
+        crs = src.crs
+        for _, window in src.block_windows(1):
+            block = src.read(1, window=window)
+            transform = src.window_transform(window)
+            for vec, value in rasterio.features.shapes(block,
+                                                       transform=transform):
+                polygons.append(shape(vec))
+                labels.append(int(value))
+
+    gdf = geopandas.GeoDataFrame({"label": labels}, geometry=polygons,
+                                 crs=crs)
+
+    return gdf.dissolve(by="label").reset_index()
 
 
 def distance_fast(c_series, ic, jc, subim, S, m, rmin, cmin,  
@@ -335,6 +621,245 @@ def distance(c_series, ic, jc, subim, S, m, rmin, cmin,
     return D
 
 
+def _dtw_settings(window=None, max_dist=None, max_step=None, penalty=None,
+                  psi=None):
+    # DTW parameters in the form used by the kernels, following the \
+    # conventions of dtaidistance (limits are squared, 0 is no limit)
+    window = int(window) if window else 0
+    max_dist = float(max_dist) ** 2 if max_dist else numpy.inf
+    max_step = float(max_step) ** 2 if max_step else numpy.inf
+    penalty = float(penalty) ** 2 if penalty else 0.
+
+    if psi is None:
+        psi = (0, 0, 0, 0)
+    elif isinstance(psi, (tuple, list)):
+        psi = tuple(psi) * 4 if len(psi) == 1 else tuple(psi)
+    else:
+        psi = (psi,) * 4
+
+    return window, max_dist, max_step, penalty, tuple(int(p) for p in psi)
+
+
+@njit(nogil=True, cache=True)
+def _dtw(s1, s2, window, max_dist, max_step, penalty, psi, prev, cur):
+    # DTW distance between two series of the same length with a \
+    # Sakoe-Chiba window, as dtaidistance.dtw.distance. The computation is \
+    # abandoned as soon as a whole row of the cost matrix exceeds max_dist. \
+    # prev and cur are buffers with one more position than the series.
+    n = s1.shape[0]
+    psi_1b, psi_1e, psi_2b, psi_2e = psi
+
+    if window <= 0:
+        window = n
+
+    prev[:] = numpy.inf
+    prev[:psi_2b + 1] = 0.
+
+    psi_shortest = numpy.inf
+
+    for i in range(n):
+        cur[:] = numpy.inf
+        if i < psi_1b:
+            cur[0] = 0.
+
+        row_min = numpy.inf
+        for j in range(max(0, i - window + 1), min(n, i + window)):
+            diff = numpy.float64(s1[i]) - numpy.float64(s2[j])
+            cost = diff * diff
+            if cost > max_step:
+                continue
+            best = min(prev[j], prev[j + 1] + penalty, cur[j] + penalty)
+            cur[j + 1] = cost + best
+            if cur[j + 1] < row_min:
+                row_min = cur[j + 1]
+
+        if psi_1e != 0 and n - 1 - i <= psi_1e:
+            psi_shortest = min(psi_shortest, cur[n])
+
+        # Costs only grow along a path, unless a relaxed start is ahead
+        if row_min > max_dist and psi_shortest > max_dist and \
+                i + 1 >= psi_1b:
+            return numpy.inf
+
+        prev, cur = cur, prev
+
+    # prev holds the last row
+    result = prev[n]
+    for j in range(n - psi_2e, n):
+        result = min(result, prev[j])
+    result = min(result, psi_shortest)
+
+    if result > max_dist:
+        return numpy.inf
+
+    return numpy.sqrt(result)
+
+
+@njit(nogil=True, cache=True)
+def _envelope(c_series, window):
+    # Upper and lower envelopes of a series in the Sakoe-Chiba window
+    n = c_series.shape[0]
+    if window <= 0:
+        window = n
+
+    upper = numpy.empty(n)
+    lower = numpy.empty(n)
+    for i in range(n):
+        lo = max(0, i - window + 1)
+        hi = min(n, i + window)
+        upper[i] = c_series[lo:hi].max()
+        lower[i] = c_series[lo:hi].min()
+
+    return upper, lower
+
+
+@njit(nogil=True, cache=True)
+def _lower_bound(series, c_series, upper, lower, psi, limit):
+    # Lower bound of the squared DTW distance: LB_Kim at the first and last \
+    # values, that every warping path matches, and LB_Keogh in between. \
+    # Rows that psi allows to skip are left out. It returns as soon as the \
+    # bound exceeds limit.
+    n = series.shape[0]
+    psi_1b, psi_1e, psi_2b, psi_2e = psi
+
+    bound = 0.
+    first = psi_1b
+    last = n - psi_1e
+
+    if psi_1b == 0 and psi_1e == 0 and psi_2b == 0 and psi_2e == 0 and n > 1:
+        diff = numpy.float64(series[0]) - numpy.float64(c_series[0])
+        bound += diff * diff
+        diff = numpy.float64(series[n - 1]) - numpy.float64(c_series[n - 1])
+        bound += diff * diff
+        if bound > limit:
+            return bound
+        first, last = 1, n - 1
+
+    for i in range(first, last):
+        value = numpy.float64(series[i])
+        if value > upper[i]:
+            bound += (value - upper[i]) ** 2
+        elif value < lower[i]:
+            bound += (lower[i] - value) ** 2
+        if bound > limit:
+            return bound
+
+    return bound
+
+
+@njit(nogil=True, cache=True)
+def _assign_cluster(img, c_series, kk, ic, jc, rmin, rmax, cmin, cmax, S, m,
+                    d, l, it, n, pruning, window, max_dist, max_step, penalty,
+                    psi):
+    # Spatio-temporal distance of each pixel of the block around a cluster \
+    # centre, as in distance_fast, written in d and l where it is smaller \
+    # than the current distance. it keeps the iteration n in which each \
+    # label was set: in a tie within the same iteration the smallest \
+    # cluster wins, as if the clusters were visited in order. With pruning, \
+    # the DTW is skipped where a lower bound already exceeds the current \
+    # distance. Returns the number of pixels pruned.
+    m = m / 10
+    series = numpy.empty(img.shape[0])
+    prev = numpy.empty(img.shape[0] + 1)
+    cur = numpy.empty(img.shape[0] + 1)
+    upper, lower = _envelope(c_series, window)
+
+    pruned = 0
+
+    for r in range(rmin, rmax):
+        for c in range(cmin, cmax):
+            for b in range(img.shape[0]):
+                series[b] = img[b, r, c]
+
+            ds = ((r - rmin - ic) ** 2 + (c - cmin - jc) ** 2) ** 0.5
+
+            if pruning and d[r, c] < numpy.inf:
+                # Largest DTW distance that could still beat d, with a \
+                # margin for the rounding of the bound
+                allowed = (d[r, c] - ds / S) * m * (1 + 1e-9)
+                limit = allowed * allowed
+                if allowed < 0 or _lower_bound(series, c_series, upper,
+                                               lower, psi, limit) > limit:
+                    pruned += 1
+                    continue
+
+            dc = _dtw(series, c_series, window, max_dist, max_step, penalty,
+                      psi, prev, cur)
+            D = dc / m + ds / S
+
+            if D < d[r, c] or (D == d[r, c] and it[r, c] == n and
+                               kk < l[r, c]):
+                d[r, c] = D
+                l[r, c] = kk
+                it[r, c] = n
+
+    return pruned
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _assign_clusters(img, C, clusters, S, m, d, l, it, n, pruning, window,
+                     max_dist, max_step, penalty, psi):
+    # Assignment step of a group of clusters whose search windows do not \
+    # overlap, so they are computed by parallel threads. Returns the number \
+    # of pixels compared and the number of them pruned.
+    bands, rows, columns = img.shape
+
+    compared = 0
+    pruned = 0
+
+    for i in prange(clusters.shape[0]):
+        kk = clusters[i]
+
+        # Get subimage around cluster, clipped to the image as a slice is
+        rmin = int(numpy.floor(max(C[kk, bands]-S, 0)))
+        rmax = min(int(numpy.floor(min(C[kk, bands]+S, rows))+1), rows)
+        cmin = int(numpy.floor(max(C[kk, bands+1]-S, 0)))
+        cmax = min(int(numpy.floor(min(C[kk, bands+1]+S, columns))+1),
+                   columns)
+
+        # Cluster centre coordinates in the subimage
+        ic = int(numpy.floor(C[kk, bands])) - rmin
+        jc = int(numpy.floor(C[kk, bands+1])) - cmin
+
+        compared += (rmax - rmin) * (cmax - cmin)
+        pruned += _assign_cluster(img, C[kk, :bands], kk, ic, jc, rmin, rmax,
+                                  cmin, cmax, S, m, d, l, it, n, pruning,
+                                  window, max_dist, max_step, penalty, psi)
+
+    return compared, pruned
+
+
+def _cluster_groups(C, bands, S):
+    # Split the clusters in groups whose search windows do not overlap. \
+    # The image is divided in cells larger than a window, coloured as a \
+    # checkerboard: clusters in cells of the same colour are two cells \
+    # apart, so each group takes one cluster of each cell of a colour.
+    centres = C[:, bands:bands + 2]
+    clusters = numpy.flatnonzero(~numpy.isnan(centres).any(axis=1))
+
+    if clusters.size == 0:
+        return []
+
+    cells = numpy.floor(centres[clusters] / (2 * S + 2)).astype(int)
+    colour = (cells[:, 0] % 2) * 2 + cells[:, 1] % 2
+
+    # Position of each cluster among the clusters of its cell
+    cell_id = cells[:, 0] * (cells[:, 1].max() + 1) + cells[:, 1]
+    order = numpy.lexsort((clusters, cell_id))
+    first = numpy.r_[True, cell_id[order][1:] != cell_id[order][:-1]]
+    start = numpy.maximum.accumulate(numpy.where(first,
+                                                 numpy.arange(len(order)), 0))
+    rank = numpy.empty(len(order), dtype=int)
+    rank[order] = numpy.arange(len(order)) - start
+
+    groups = []
+    for c in range(4):
+        for r in numpy.unique(rank[colour == c]):
+            groups.append(clusters[(colour == c) & (rank == r)])
+
+    return groups
+
+
 @njit(parallel=True, fastmath=True)
 def update_cluster(img, la, rows, columns, bands, k):
     """This function update clusters.
@@ -364,19 +889,21 @@ def update_cluster(img, la, rows, columns, bands, k):
     # Allocate array info for centres
     C_new = numpy.zeros(c_shape)
 
-    # Update cluster centres with mean values
-    for r in prange(rows):
+    # Update cluster centres with mean values. Rows are added in sequence, \
+    # as pixels of different rows may belong to the same cluster.
+    for r in range(rows):
         for c in range(columns):
-            tmp = numpy.append(img[:, r, c], numpy.array([r, c, 1]))
             kk = int(la[r, c])
-            C_new[kk, :] = C_new[kk, :] + tmp
+            for b in range(bands):
+                C_new[kk, b] += img[b, r, c]
+            C_new[kk, bands] += r
+            C_new[kk, bands+1] += c
+            C_new[kk, bands+2] += 1
 
     # Compute mean
     for kk in prange(k):
         C_new[kk, :] = C_new[kk, :]/C_new[kk, bands+2]
 
-    tmp = None
-
     return C_new
 
 
@@ -637,7 +1164,7 @@ def seg_metrics(dataframe, bands, metrics_dict={
     :returns out_dataframe: Geopandas dataframe with the features added.
     """
     import pandas
-    from .utils import list_metrics
+    from .metrics import metrics_schema
 
     out_dataframe = dataframe.copy()
 
@@ -654,7 +1181,8 @@ def seg_metrics(dataframe, bands, metrics_dict={
                                            metrics_dict,
                                            num_cores)
 
-                header = list_metrics()
+                header = [name for name, _, _
+                          in metrics_schema(metrics_dict)]
 
                 names = [i + '_' + j + '_' + k
                          for i, j, k in zip([band] * len(header),
@@ -670,7 +1198,8 @@ def seg_metrics(dataframe, bands, metrics_dict={
                                        metrics_dict,
                                        num_cores)
 
-            header = list_metrics()
+            header = [name for name, _, _
+                      in metrics_schema(metrics_dict)]
 
             names = [i + '_' + k
                      for i, k in zip([band] * len(header),
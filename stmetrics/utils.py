@@ -46,6 +46,170 @@ def fixseries(timeseries, nodata=-9999):
     return timeseries2
 
 
+class PreparedSeries(object):
+    """This class prepares a time series once, so that it can be shared by \
+    all the metrics computed over it.
+
+    The time series is fixed by ``fixseries`` only when it is needed for the \
+    first time. The fixed series and the artifacts derived from it are \
+    cached and are read-only. All metric functions of stmetrics accept a \
+    ``PreparedSeries`` in place of the time series. In that case, the nodata \
+    informed to the metric is ignored and the nodata of the \
+    ``PreparedSeries`` is used.
+
+    :param timeseries: Your time series.
+    :type timeseries: numpy.ndarray
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+    """
+
+    # Intermediates each intermediate depends on
+    requires = {
+        'series': [],
+        'diff': ['series'],
+        'sorted': ['series'],
+        'quartiles': ['series'],
+        'fft': ['series'],
+        'cumsum': ['series'],
+        'polygon': ['series'],
+        'seasons': ['polygon'],
+    }
+
+    def __init__(self, timeseries, nodata=-9999):
+        self.timeseries = timeseries
+        self.nodata = nodata
+        self._cache = dict()
+
+    def _get(self, key, func):
+        # Compute and store artifacts. Exceptions are stored as well, \
+        # so invalid time series are not checked again by every metric.
+        if key not in self._cache:
+            try:
+                value = func()
+                if isinstance(value, numpy.ndarray):
+                    value.setflags(write=False)
+            except Exception as error:
+                value = error
+            self._cache[key] = value
+
+        value = self._cache[key]
+
+        if isinstance(value, Exception):
+            raise value
+
+        return value
+
+    @property
+    def series(self):
+        """Time series fixed by ``fixseries``."""
+        return self._get('series',
+                         lambda: fixseries(self.timeseries, self.nodata))
+
+    @property
+    def diff(self):
+        """First difference of the fixed time series."""
+        return self._get('diff', lambda: numpy.diff(self.series))
+
+    @property
+    def sorted(self):
+        """Sorted copy of the fixed time series."""
+        return self._get('sorted', lambda: numpy.sort(self.series))
+
+    @property
+    def quartiles(self):
+        """Quartiles of the fixed time series, as a dictionary with the \
+        linear (25, 50 and 75) and the midpoint (25 and 75) interpolations. \
+        Each interpolation needs a single partial sort of the series."""
+        return self._get('quartiles', lambda: {
+            'linear': numpy.percentile(self.series, [25, 50, 75],
+                                       interpolation='linear'),
+            'midpoint': numpy.percentile(self.series, [25, 75],
+                                         interpolation='midpoint')})
+
+    @property
+    def fft(self):
+        """Discrete Fourier Transform of the fixed time series."""
+        return self._get('fft', lambda: numpy.fft.fft(self.series))
+
+    @property
+    def cumsum(self):
+        """Cumulative sum of the fixed time series."""
+        return self._get('cumsum', lambda: numpy.cumsum(self.series))
+
+    @property
+    def polygon(self):
+        """Polygon of the time series in polar space."""
+        return self._get('polygon', lambda: _polygon(self.series))
+
+    @property
+    def seasons(self):
+        """Polygons of the time series in each quadrant of the polar space, \
+        as returned by ``polar.area_season``."""
+        from .polar import season_polygons
+
+        return self._get('seasons', lambda: season_polygons(self.polygon))
+
+
+def prepare(timeseries, nodata=-9999):
+    """This function returns a ``PreparedSeries`` of the time series. If the \
+    time series is already prepared, it is returned as it is.
+
+    :param timeseries: Your time series.
+    :type timeseries: numpy.ndarray or PreparedSeries
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :return prepared: PreparedSeries of the time series.
+    """
+    if isinstance(timeseries, PreparedSeries):
+        return timeseries
+
+    return PreparedSeries(timeseries, nodata)
+
+
+def fixseries_batch(matrix, nodata=-9999, dtype="float64"):
+    """This function applies ``fixseries`` to every row of a matrix of \
+    time series at once.
+
+    Nodata values are masked, the valid observations of each row are moved \
+    to the beginning of the row (keeping their order) and the remaining \
+    positions are filled with NaN. The spikes are then removed in the same \
+    way ``fixseries`` does it for a single time series.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :param nodata: nodata of the time series. Default is -9999.
+    :type nodata: int
+
+    :param dtype: Floating point type of the fixed time series. Default \
+    is float64.
+    :type dtype: string
+
+    :return fixed_matrix: Numpy array of time series without spikes, \
+    padded with NaN at the end of each row.
+    """
+    # casting to float
+    matrix = numpy.array(matrix, dtype=dtype, ndmin=2)
+
+    # Remove nodata, as fixseries zeros are kept when nodata is 0
+    if nodata != 0:
+        matrix[matrix == nodata] = numpy.nan
+
+    # Move valid values to the beginning of each row
+    order = numpy.argsort(numpy.isnan(matrix), axis=1, kind='stable')
+    matrix = numpy.take_along_axis(matrix, order, axis=1)
+
+    # A spike is a non zero value between two zeros
+    zeros = matrix == 0
+    spikes = zeros[:, :-2] & zeros[:, 2:] & ~zeros[:, 1:-1]
+    matrix[:, 1:-1][spikes] = 0
+
+    return matrix
+
+
 def create_polygon(timeseries):
     """This function converts a time series to the polar space.
 
@@ -57,14 +221,24 @@ def create_polygon(timeseries):
 
     :return polygon: Shapely polygon of time series without spikes.
     """
+    # remove weird spikes on timeseries
+    try:
+        ts = fixseries(timeseries)
+    except:
+        raise ValueError("Unable to create a valid polygon")
+
+    return _polygon(ts)
+
+
+def _polygon(timeseries):
+    # Polygon of a time series already fixed by fixseries
     from shapely.geometry import Polygon
     from shapely.geometry.polygon import LinearRing
 
-    # remove weird spikes on timeseries
     try:
-        ts = fixseries(timeseries)
+        check_input(timeseries)
 
-        list_of_radius, list_of_angles = get_list_of_points(ts)
+        list_of_radius, list_of_angles = get_list_of_points(timeseries)
 
         # create polygon geometry
         ring = list()
@@ -145,6 +319,26 @@ def check_input(timeseries):
         raise TypeError('Please use numpy.array as input.')
 
 
+def check_input_batch(matrix):
+    """This function applies the rules of ``check_input`` to every row \
+    of a matrix of time series.
+
+    :param matrix: Matrix of time series (pixels x time).
+    :type matrix: numpy.ndarray
+
+    :return valid: Boolean array with True for the rows that are valid.
+    """
+    matrix = numpy.array(matrix, ndmin=2, copy=False)
+
+    if matrix.shape[1] < 5:
+        return numpy.zeros(matrix.shape[0], dtype=bool)
+
+    nans = numpy.isnan(matrix).all(axis=1)
+    zeros = (matrix == 0).all(axis=1)
+
+    return ~(nans | zeros)
+
+
 def file_to_da(filepath):
     import re
     import pandas
@@ -262,3 +456,105 @@ def list_metrics():
 def truncate(n, decimals=6):
     multiplier = 10 ** decimals
     return int(n * multiplier) / multiplier
+
+
+def quantize(values, scale=10000, nodata=-32768, dtype="int16", offset=0):
+    """This function stores metrics as scaled integers, a compact \
+    replacement for ``truncate``. The offset is subtracted from the \
+    values, that are multiplied by ``scale`` and truncated, so \
+    ``scale=10000`` keeps four decimals.
+
+    :param values: Values to be stored.
+    :type values: numpy.ndarray
+
+    :param scale: Multiplier applied before truncation. A sequence gives \
+    the multiplier of each layer (first axis) of ``values``. Default is \
+    10000.
+    :type scale: real number or list
+
+    :param nodata: Value that replaces NaN and values out of the range \
+    of the integer type. Default is -32768.
+    :type nodata: int
+
+    :param dtype: Integer type of the output. Default is int16.
+    :type dtype: string
+
+    :param offset: Value subtracted before scaling. A sequence gives the \
+    offset of each layer of ``values``. Default is 0.
+    :type offset: real number or list
+
+    :return quantized: Numpy array of scaled integers.
+    """
+    info = numpy.iinfo(dtype)
+
+    values = numpy.asarray(values, dtype=float)
+    scale, offset = _layer_params(values, scale, offset)
+
+    with numpy.errstate(invalid='ignore', over='ignore'):
+        scaled = numpy.trunc((values - offset) * scale)
+
+    invalid = ~numpy.isfinite(scaled) | (scaled < info.min) | \
+        (scaled > info.max)
+
+    scaled[invalid] = nodata
+
+    return scaled.astype(dtype)
+
+
+def dequantize(values, scale=10000, nodata=-32768, offset=0):
+    """This function restores the metrics stored by ``quantize``.
+
+    :param values: Scaled integers.
+    :type values: numpy.ndarray
+
+    :param scale: Multiplier used by ``quantize``. Default is 10000.
+    :type scale: real number or list
+
+    :param nodata: nodata used by ``quantize``. Default is -32768.
+    :type nodata: int
+
+    :param offset: Offset used by ``quantize``. Default is 0.
+    :type offset: real number or list
+
+    :return values: Numpy array of metrics, with NaN in place of nodata.
+    """
+    values = numpy.asarray(values)
+    scale, offset = _layer_params(values, scale, offset)
+
+    out = values / scale + offset
+    out[values == nodata] = numpy.nan
+
+    return out
+
+
+def _layer_params(values, *params):
+    # Scalars, or sequences with one value per layer shaped to broadcast \
+    # along the first axis of values
+    shape = (-1,) + (1,) * max(values.ndim - 1, 0)
+
+    return [numpy.asarray(p, dtype=float).reshape(shape)
+            if numpy.ndim(p) == 1 else float(p) for p in params]
+
+
+def truncate_array(values, decimals=6):
+    """Vectorized version of ``truncate``. Values that can not be \
+    truncated (NaN and infinity) are returned as NaN.
+
+    :param values: Values to be truncated.
+    :type values: numpy.ndarray
+
+    :param decimals: Number of decimals to keep. Default is 6.
+    :type decimals: int
+
+    :return truncated: Numpy array of truncated values.
+    """
+    multiplier = 10 ** decimals
+
+    values = numpy.asarray(values, dtype=float)
+
+    with numpy.errstate(invalid='ignore', over='ignore'):
+        out = numpy.trunc(values * multiplier) / multiplier
+
+    out[~numpy.isfinite(out)] = numpy.nan
+
+    return out
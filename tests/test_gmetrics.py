@@ -425,5 +425,781 @@ def test_sits2metrics():
 	assert all(r1 == r2)
 
 
+def test_ts_basics_batch():
+	import numpy
+	from stmetrics import basics, utils
+
+	numpy.random.seed(0)
+	matrix = numpy.random.rand(50, 23)
+	matrix[numpy.random.rand(*matrix.shape) < 0.2] = 0
+	matrix[numpy.random.rand(*matrix.shape) < 0.1] = -9999
+	matrix[0] = numpy.nan
+
+	res = basics.ts_basics_batch(matrix)
+
+	names = list(utils.error_basics().keys())
+	out = numpy.array([[basics.ts_basics(serie.copy())[n] for n in names]
+	                   for serie in matrix]).T
+
+	assert res.shape == (len(names), matrix.shape[0])
+	assert numpy.allclose(out, res, atol=1e-6, equal_nan=True)
+
+
+def test_prepared_series(monkeypatch):
+	import numpy
+	from stmetrics import metrics, utils
+
+	calls = []
+	fixseries = utils.fixseries
+
+	def counter(timeseries, nodata=-9999):
+		calls.append(nodata)
+		return fixseries(timeseries, nodata)
+
+	monkeypatch.setattr(utils, 'fixseries', counter)
+
+	series = numpy.ones(360)
+	out = metrics.get_metrics(series, {"basics": ["all"],
+	                                   "polar": ["all"],
+	                                   "fractal": ["katz_fd"]})
+
+	prepared = utils.prepare(series)
+
+	assert len(calls) == 1
+	assert utils.prepare(prepared) is prepared
+	assert out["basics"]["sum_ts"] == 360.0
+	assert out["polar"]["area_ts"] == 3.141433
+	assert prepared.diff.sum() == 0
+	assert prepared.cumsum[-1] == 360.0
+
+
+def test_ts_polar_batch():
+	import numpy
+	from stmetrics import polar
+
+	numpy.random.seed(0)
+	matrix = numpy.random.rand(30, 23)
+	matrix[numpy.random.rand(*matrix.shape) < 0.2] = 0
+	matrix[0] = numpy.ones(23)
+
+	# Only zeros are left once the spikes of the second row are removed
+	matrix[1] = 0
+	matrix[1, 1:22:3] = 0.5
+
+	res = polar.ts_polar_batch(matrix, check=True)
+
+	assert res.shape == (4, 30)
+	assert numpy.isnan(res[[0, 2, 3], 1]).all()
+
+	res = polar.ts_polar_batch(numpy.ones((2, 360)), ['area_ts', 'csi'])
+
+	assert all(res[0] == 3.141433)
+	assert all(res[1] == 1.000025)
+
+
+def test_polar_shared_geometry(monkeypatch):
+	import numpy
+	from stmetrics import polar, utils
+
+	calls = []
+	polygon = utils._polygon
+
+	def counter(timeseries):
+		calls.append(1)
+		return polygon(timeseries)
+
+	monkeypatch.setattr(utils, '_polygon', counter)
+
+	out = polar.ts_polar(numpy.ones((360)))
+
+	assert len(calls) == 1
+	assert out['area_q1'] == 0.785358
+	assert out['polar_balance'] == 0.0
+
+
+def test_best_rotation():
+	import numpy
+	from stmetrics import polar
+
+	numpy.random.seed(0)
+	s1 = numpy.random.rand(46)
+	candidates = numpy.random.rand(10, 46)
+	candidates[0] = numpy.roll(s1, 7)
+
+	shifts = polar.best_rotation(s1, candidates)
+
+	for c, shift in zip(candidates, shifts):
+		norms = [numpy.linalg.norm(s1 - numpy.roll(c, i)) for i in range(46)]
+		assert shift == numpy.argmin(norms)
+
+	assert shifts[0] == 39
+
+
+def test_symmetric_distance_batch():
+	import numpy
+	from stmetrics import polar
+
+	numpy.random.seed(0)
+	s1 = numpy.random.rand(23)
+	candidates = numpy.random.rand(5, 23)
+	candidates[0] = numpy.ones(23) * 2
+	candidates[1] = -9999
+
+	dist = polar.symmetric_distance_batch(s1, candidates)
+
+	assert numpy.isnan(dist[1])
+	for c, d in zip(candidates[[0, 2, 3, 4]], dist[[0, 2, 3, 4]]):
+		assert polar.symmetric_distance(s1.copy(), c.copy()) == d
+
+
+def test_symmetric_distance_matrix():
+	import numpy
+	from stmetrics import polar
+
+	numpy.random.seed(0)
+	series = numpy.random.rand(6, 23)
+	series[1] = series[0] + 2
+
+	dist = polar.symmetric_distance_matrix(series, num_cores=1)
+	square = polar.symmetric_distance_matrix(series, num_cores=2, square=True)
+
+	assert dist.shape == (15,)
+	assert all(dist == square[numpy.triu_indices(6, 1)])
+	assert all(square.diagonal() == 0)
+	assert square[2, 4] == polar.symmetric_distance(series[2].copy(),
+	                                                series[4].copy())
+
+
+def test_dfa_batch():
+	import nolds
+	import numpy
+	from stmetrics import fractal, utils
+
+	numpy.random.seed(0)
+	matrix = numpy.random.rand(20, 46)
+	matrix[numpy.random.rand(*matrix.shape) < 0.1] = -9999
+	matrix[0] = 1
+
+	res = fractal.dfa_batch(matrix)
+
+	out = numpy.array([nolds.dfa(utils.fixseries(serie), fit_exp='poly')
+	                   for serie in matrix])
+
+	assert numpy.isnan(res[0])
+	assert numpy.allclose(out[1:], res[1:], atol=1e-5)
+
+
+def test_hurst_batch():
+	import nolds
+	import numpy
+	from stmetrics import fractal, utils
+
+	numpy.random.seed(0)
+	matrix = numpy.random.rand(20, 46)
+	matrix[numpy.random.rand(*matrix.shape) < 0.1] = -9999
+	matrix[0] = 1
+	matrix[1, 3:] = -9999
+
+	res = fractal.hurst_batch(matrix)
+
+	out = numpy.array([nolds.hurst_rs(utils.fixseries(serie), fit='poly')
+	                   for serie in matrix[2:]])
+
+	assert numpy.isnan(res[:2]).all()
+	assert numpy.allclose(out, res[2:], atol=1e-5)
+
+
+def test_sits2metrics_blocks():
+	import numpy
+	from stmetrics import metrics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(10, 5, 4)
+	metrics_dict = {"basics": ["all"], "fractal": ["katz_fd"]}
+
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+
+	for block_size in [1, 2, 5, 10]:
+		out = metrics.sits2metrics(sits, metrics_dict, num_cores=2,
+		                           block_size=block_size)
+		assert numpy.array_equal(res, out, equal_nan=True)
+
+	assert res.shape == (16, 5, 4)
+	assert res[0, 3, 2] == metrics.get_metrics(sits[:, 3, 2])["basics"]["max_ts"]
+
+
+def test_sits2metrics_shared():
+	import numpy
+	import pytest
+	from stmetrics import metrics
+
+	pytest.importorskip("multiprocessing.shared_memory")
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(10, 5, 4)
+	metrics_dict = {"basics": ["max_ts", "std_ts"], "polar": ["area_ts"],
+	                "fractal": ["katz_fd"]}
+
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+
+	for num_cores in [1, 2]:
+		out = metrics.sits2metrics(sits, metrics_dict, num_cores=num_cores,
+		                           block_size=2, shared=True)
+		assert numpy.array_equal(res, out, equal_nan=True)
+
+
+def test_sits2raster(tmp_path):
+	import numpy
+	import pytest
+	import rasterio
+	from rasterio.transform import from_origin
+	from stmetrics import metrics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(10, 7, 5)
+	metrics_dict = {"basics": ["max_ts", "std_ts"], "fractal": ["katz_fd"]}
+
+	src_path = str(tmp_path / "sits.tif")
+	profile = dict(driver="GTiff", count=10, height=7, width=5,
+	               dtype="float64", crs="EPSG:4326",
+	               transform=from_origin(-45, -10, 0.1, 0.1))
+	with rasterio.open(src_path, "w", **profile) as dst:
+		dst.write(sits)
+
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+
+	for num_cores in [1, 2]:
+		out_path = str(tmp_path / "metrics_{}.tif".format(num_cores))
+		with rasterio.open(src_path) as src:
+			metrics.sits2raster(src, out_path, metrics_dict,
+			                    num_cores=num_cores, tile_size=3)
+
+		with rasterio.open(out_path) as out:
+			assert out.crs == profile["crs"]
+			assert out.transform == profile["transform"]
+			assert out.descriptions == ("max_ts", "std_ts", "katz_fd")
+			assert numpy.array_equal(res, out.read(), equal_nan=True)
+
+	# katz_fd above 3.2767 does not fit in int16 with the default scale
+	out_path = str(tmp_path / "metrics_int16.tif")
+	with pytest.warns(UserWarning, match="katz_fd"):
+		metrics.sits2raster(src_path, out_path, metrics_dict, num_cores=1,
+		                    dtype="int16")
+
+	metrics.sits2raster(src_path, out_path, metrics_dict, num_cores=1,
+	                    dtype="int16", scale=[10000, 10000, 1000],
+	                    offset=[0, 0, 1])
+	with rasterio.open(out_path) as out:
+		assert out.scales == (1e-4, 1e-4, 1e-3)
+		assert out.offsets == (0, 0, 1)
+		values = out.read() * numpy.array(out.scales)[:, None, None] + \
+			numpy.array(out.offsets)[:, None, None]
+		assert numpy.allclose(values, res, atol=1e-3)
+
+
+def test_sits2metrics_xarray():
+	import numpy
+	import pytest
+	import xarray
+	from stmetrics import metrics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(10, 6, 4)
+	metrics_dict = {"basics": ["max_ts", "std_ts"], "fractal": ["katz_fd"]}
+
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+
+	dataset = xarray.Dataset(
+		{"ndvi": (["time", "y", "x"], sits)},
+		coords={"time": numpy.arange(10), "y": numpy.arange(6),
+		        "x": numpy.arange(4)})
+
+	out = metrics.sits2metrics(dataset.copy(), metrics_dict, num_cores=1)
+
+	assert list(out["ndvi_metrics"].metric.values) == \
+		["max_ts", "std_ts", "katz_fd"]
+	assert out["ndvi_metrics"].dims == ("metric", "y", "x")
+	assert numpy.array_equal(out["ndvi_metrics"].values, res,
+	                         equal_nan=True)
+
+	pytest.importorskip("dask")
+
+	lazy = metrics.sits2metrics(dataset.chunk({"y": 2, "x": 3}),
+	                            metrics_dict)
+
+	assert lazy["ndvi_metrics"].chunks is not None
+	assert numpy.array_equal(lazy["ndvi_metrics"].values, res,
+	                         equal_nan=True)
+
+
+def test_sits2metrics_checkpoint(tmp_path):
+	import json
+	import numpy
+	import pytest
+	from stmetrics import metrics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(10, 6, 4)
+	metrics_dict = {"basics": ["max_ts", "std_ts"], "fractal": ["katz_fd"]}
+	checkpoint = str(tmp_path / "job")
+
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=2,
+	                           block_size=2, checkpoint=checkpoint)
+	assert numpy.array_equal(res, out, equal_nan=True)
+
+	# Simulate a crash after the first block
+	with open(checkpoint + "/manifest.json") as f:
+		manifest = json.load(f)
+	manifest["done"] = [0]
+	with open(checkpoint + "/manifest.json", "w") as f:
+		json.dump(manifest, f)
+
+	# Finished blocks are not computed again
+	sits[:, :2, :] = 0
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=1,
+	                           block_size=2, checkpoint=checkpoint)
+	assert numpy.array_equal(res, out, equal_nan=True)
+
+	with open(checkpoint + "/manifest.json") as f:
+		assert sorted(json.load(f)["done"]) == [0, 2, 4]
+
+	with pytest.raises(ValueError):
+		metrics.sits2metrics(sits, metrics_dict, block_size=3,
+		                     checkpoint=checkpoint)
+
+	# A job created with the default block size is resumed with other cores
+	sits = numpy.random.rand(10, 6, 4)
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+	checkpoint = str(tmp_path / "default")
+
+	metrics.sits2metrics(sits, metrics_dict, num_cores=2,
+	                     checkpoint=checkpoint)
+	with open(checkpoint + "/manifest.json") as f:
+		manifest = json.load(f)
+	manifest["done"] = [0]
+	with open(checkpoint + "/manifest.json", "w") as f:
+		json.dump(manifest, f)
+
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=1,
+	                           checkpoint=checkpoint)
+	assert numpy.array_equal(res, out, equal_nan=True)
+
+
+def test_sits2metrics_invalid(monkeypatch):
+	import numpy
+	from stmetrics import metrics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(10, 6, 4)
+	sits[:, :2, :] = numpy.nan
+	sits[:, 3, 1] = 0
+	sits[:, 4, :] = numpy.nan
+	sits[:, 4, 2] = 0
+
+	res = metrics.sits2metrics(sits, num_cores=1, block_size=2)
+
+	assert numpy.isnan(res[:, :2, :]).all()
+	assert numpy.isnan(res[:, 3, 1]).all()
+	assert numpy.isnan(res[:, 4, :]).all()
+
+	for i, j in [(3, 0), (2, 3), (5, 2)]:
+		expected = metrics._getmetrics(sits[:, i, j], metrics.METRICS_DICT)
+		assert numpy.array_equal(res[:, i, j], expected[:, 0],
+		                         equal_nan=True)
+
+	# Time series with only nodata get their values without being computed
+	sits[:, :2, :] = -9999
+	sits[:, 5, 1] = -9999
+	sits[2:4, 5, 1] = numpy.nan
+	expected = metrics._getmetrics(sits[:, 5, 1], metrics.METRICS_DICT)
+
+	calls = []
+	fill_metrics = metrics._fill_metrics
+
+	def counter(timeseries, plan, out):
+		calls.append(1)
+		return fill_metrics(timeseries, plan, out)
+
+	monkeypatch.setattr(metrics, '_fill_metrics', counter)
+
+	res = metrics.sits2metrics(sits, num_cores=1, block_size=2)
+
+	for i, j in [(0, 0), (1, 3), (5, 1)]:
+		assert numpy.array_equal(res[:, i, j], expected[:, 0],
+		                         equal_nan=True)
+
+	# The 10 other series are computed, and the values of the series with \
+	# only nodata once for the image and once for the block of (5, 1)
+	assert len(calls) == 10 + 2
+
+
+def test_metrics_schema():
+	import numpy
+	from stmetrics import metrics, utils
+
+	schema = metrics.metrics_schema(metrics.METRICS_DICT)
+
+	assert [name for name, _, _ in schema] == utils.list_metrics()
+	assert all(dtype == "float64" for _, dtype, _ in schema)
+
+	schema = metrics.metrics_schema({"fractal": ["katz_fd"],
+	                                 "basics": ["std_ts", "max_ts"]})
+
+	assert schema == [("std_ts", "float64", "basics"),
+	                  ("max_ts", "float64", "basics"),
+	                  ("katz_fd", "float64", "fractal")]
+
+	schema = metrics.metrics_schema({"basics": ["std_ts"]}, dtype="int16")
+
+	assert schema == [("std_ts", "int16", "basics")]
+
+	numpy.random.seed(0)
+	serie = numpy.random.rand(20)
+	res = metrics._getmetrics(serie, {"fractal": ["katz_fd"],
+	                                  "basics": ["std_ts", "max_ts"]})
+	out = metrics.get_metrics(serie, {"fractal": ["katz_fd"],
+	                                  "basics": ["std_ts", "max_ts"]})
+
+	assert res.shape == (3, 1)
+	assert list(res[:, 0]) == [out["basics"]["std_ts"],
+	                           out["basics"]["max_ts"],
+	                           out["fractal"]["katz_fd"]]
+
+
+def test_metrics_plan():
+	import numpy
+	from stmetrics import basics, metrics
+
+	intermediates, functions = metrics.metrics_plan(
+		{"basics": ["fqr_ts", "sqr_ts", "tqr_ts", "iqr_ts", "amd_ts"],
+		 "fractal": ["katz_fd"], "polar": ["polar_balance"]})
+
+	assert intermediates == ["series", "quartiles", "diff",
+	                         "polygon", "seasons"]
+	assert functions[0] is basics.fqr_ts
+	assert len(functions) == 7
+
+	intermediates, functions = metrics.metrics_plan({"basics": ["bogus"]})
+	assert intermediates == [] and functions == [None]
+
+	numpy.random.seed(0)
+	serie = numpy.random.rand(20)
+	out = basics.ts_basics(serie, ["fqr_ts", "iqr_ts", "bogus"])
+
+	assert out["fqr_ts"] == basics.truncate(
+		numpy.percentile(serie, 25, interpolation='midpoint'))
+	assert out["iqr_ts"] == basics.truncate(
+		numpy.percentile(serie, 75) - numpy.percentile(serie, 25))
+	assert numpy.isnan(out["bogus"])
+
+
+def test_basics_accumulator(tmp_path):
+	import numpy
+	from stmetrics import basics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(12, 50)
+	sits[numpy.random.rand(12, 50) < 0.3] = 0
+	sits[numpy.random.rand(12, 50) < 0.1] = -9999
+	sits[:, :5] = 0
+
+	acc = basics.BasicsAccumulator((50,))
+	for t in range(12):
+		acc.update(sits[t])
+		if t == 6:
+			acc.save(str(tmp_path / "state.npz"))
+			acc = basics.BasicsAccumulator.load(str(tmp_path / "state.npz"))
+
+	out = acc.finalize()
+	ref = numpy.array([[basics.ts_basics(sits[:, p])[f] for p in range(50)]
+	                   for f in acc.metrics])
+
+	assert out.shape == (11, 50)
+	assert numpy.isnan(out[:, :5]).all()
+	assert numpy.allclose(out, ref, atol=2e-6, equal_nan=True)
+
+	out = acc.finalize(["sum_ts", "skew_ts"])
+	assert numpy.allclose(out, ref[[4, 8]], atol=2e-6, equal_nan=True)
+
+
+def test_ts_basics_jit():
+	import numpy
+	import pytest
+	from stmetrics import basics, fractal, metrics
+
+	numpy.random.seed(0)
+	matrix = numpy.random.rand(60, 12)
+	matrix[numpy.random.rand(60, 12) < 0.3] = 0
+	matrix[numpy.random.rand(60, 12) < 0.1] = -9999
+	matrix[:5] = 0
+	matrix[5:10] = -9999
+
+	out = basics.ts_basics_jit(matrix, basics.KERNEL_METRICS, num_cores=2)
+	ref = numpy.array([[{**basics.ts_basics(serie),
+	                     **fractal.ts_fractal(serie, ["katz_fd"])}[f]
+	                    for serie in matrix] for f in basics.KERNEL_METRICS])
+
+	assert numpy.allclose(out, ref, atol=1e-6, equal_nan=True)
+
+	sits = matrix.T.reshape(12, 6, 10)
+	metrics_dict = {"basics": ["all"], "fractal": ["katz_fd"]}
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=2,
+	                           block_size=2, threads=True)
+
+	assert numpy.allclose(out, res, atol=1e-6, equal_nan=True)
+
+	with pytest.raises(ValueError):
+		metrics.sits2metrics(sits, {"polar": ["area_ts"]}, threads=True)
+
+
+def test_float32_and_quantize():
+	import numpy
+	import pytest
+	from stmetrics import basics, metrics, utils
+
+	numpy.random.seed(0)
+	sits = (numpy.random.rand(10, 4, 3) * 10000).astype("int16")
+	metrics_dict = {"basics": ["max_ts", "std_ts"], "fractal": ["katz_fd"]}
+
+	res = metrics.sits2metrics(sits, metrics_dict, num_cores=1)
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=1,
+	                           dtype="float32")
+
+	assert out.dtype == numpy.float32
+	assert numpy.allclose(out, res, rtol=1e-6)
+
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=1,
+	                           threads=True, dtype="float32")
+	assert out.dtype == numpy.float32
+	assert numpy.allclose(out, res, rtol=1e-5)
+
+	with pytest.raises(ValueError):
+		metrics.sits2metrics(sits, metrics_dict, num_cores=1, dtype="int16")
+
+	matrix = sits.reshape(10, -1).T
+	out = basics.ts_basics_batch(matrix, dtype="float32")
+	assert out.dtype == numpy.float32
+	assert numpy.allclose(out, basics.ts_basics_batch(matrix), rtol=1e-4)
+
+	values = numpy.array([0.123456, -1.5, numpy.nan, 4])
+	quantized = utils.quantize(values)
+
+	assert quantized.dtype == numpy.int16
+	assert list(quantized) == [1234, -15000, -32768, -32768]
+	assert numpy.array_equal(utils.dequantize(quantized),
+	                         [0.1234, -1.5, numpy.nan, numpy.nan],
+	                         equal_nan=True)
+
+	values = numpy.array([[0.5, 1.5], [5.5, 7.25]])
+	quantized = utils.quantize(values, [10000, 100], offset=[0, 5])
+
+	assert quantized.tolist() == [[5000, 15000], [50, 225]]
+	assert numpy.allclose(utils.dequantize(quantized, [10000, 100],
+	                                       offset=[0, 5]), values)
+
+	# The shared memory engine needs Python 3.8+
+	pytest.importorskip("multiprocessing.shared_memory")
+
+	for dtype in ["float64", "float32"]:
+		out = metrics.sits2metrics(sits, metrics_dict, num_cores=1,
+		                           shared=True, dtype=dtype)
+		assert out.dtype == numpy.dtype(dtype)
+		assert numpy.allclose(out, res, rtol=1e-5)
+
+
+def test_sits2metrics_windows():
+	import numpy
+	import pytest
+	from stmetrics import metrics
+
+	numpy.random.seed(0)
+	sits = numpy.random.rand(20, 4, 3) * 10000
+	sits[:, 0, 0] = 0
+	sits[4:6, 1, 1] = numpy.nan
+	metrics_dict = {"basics": ["max_ts", "mean_ts", "sum_ts"],
+	                "fractal": ["katz_fd"]}
+
+	windows = [(0, 10), (10, 20), (5, 15)]
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=1,
+	                           windows=windows)
+
+	assert out.shape == (3, 4, 4, 3)
+	for w, (start, end) in enumerate(windows):
+		res = metrics.sits2metrics(sits[start:end], metrics_dict, num_cores=1)
+		assert numpy.allclose(out[w], res, equal_nan=True)
+
+	out = metrics.sits2metrics(sits, metrics_dict, num_cores=1, window=8,
+	                           step=6)
+	assert out.shape == (3, 4, 4, 3)
+
+	with pytest.raises(ValueError):
+		metrics.sits2metrics(sits, metrics_dict, windows=[(15, 25)])
+
+
+def test_snitc_dtw_kernel():
+	import numpy
+	from dtaidistance import dtw
+	from stmetrics import spatial
+
+	numpy.random.seed(0)
+	img = numpy.random.rand(12, 9, 9)
+	c_series = numpy.random.rand(12)
+	buffers = numpy.empty(13), numpy.empty(13)
+
+	for window in [None, 1, 3]:
+		settings = spatial._dtw_settings(window=window)
+		assert numpy.isclose(spatial._dtw(img[:, 0, 0], c_series, *settings,
+		                                  *buffers),
+		                     dtw.distance(img[:, 0, 0], c_series,
+		                                  window=window))
+
+	settings = spatial._dtw_settings(max_dist=0.1)
+	assert numpy.isinf(spatial._dtw(img[:, 0, 0], c_series, *settings,
+	                                *buffers))
+
+	D = spatial.distance_fast(c_series, 4, 3, img[:, 1:8, 2:9], 3, 1, 1, 2)
+	d = numpy.full((9, 9), numpy.inf)
+	l = numpy.zeros((9, 9))
+	it = numpy.full((9, 9), -1)
+	spatial._assign_cluster(img, c_series, 5, 4, 3, 1, 8, 2, 9, 3, 1, d, l,
+	                        it, 0, True, *spatial._dtw_settings())
+
+	assert numpy.allclose(d[1:8, 2:9], D)
+	assert (l[1:8, 2:9] == 5).all() and (l[0] == 0).all()
+
+
+def test_snitc_cluster_groups():
+	import numpy
+	from stmetrics import spatial
+
+	numpy.random.seed(0)
+	S = 4
+	C = numpy.zeros((60, 5))
+	C[:, 2:4] = numpy.random.rand(60, 2) * 50
+	C[7, 2:4] = numpy.nan
+
+	groups = spatial._cluster_groups(C, 2, S)
+	clusters = numpy.sort(numpy.concatenate(groups))
+
+	assert list(clusters) == [kk for kk in range(60) if kk != 7]
+	for group in groups:
+		mask = numpy.zeros((60, 60), dtype=int)
+		for kk in group:
+			r0 = int(numpy.floor(max(C[kk, 2] - S, 0)))
+			r1 = int(numpy.floor(C[kk, 2] + S)) + 1
+			c0 = int(numpy.floor(max(C[kk, 3] - S, 0)))
+			c1 = int(numpy.floor(C[kk, 3] + S)) + 1
+			mask[r0:r1, c0:c1] += 1
+		assert mask.max() == 1
+
+
+def test_snitc_tol(tmp_path, capsys):
+	import numpy
+	import rasterio
+	from rasterio.transform import from_origin
+	from stmetrics import spatial
+
+	numpy.random.seed(0)
+	img = (numpy.random.rand(12, 40, 40) * 3000).astype("int16")
+	img[:, :20] += 3000
+	img[:, :, :15] += 2000
+
+	path = str(tmp_path / "sits.tif")
+	profile = dict(driver="GTiff", count=12, height=40, width=40,
+	               dtype="int16", crs="EPSG:4326",
+	               transform=from_origin(-45, -10, 0.1, 0.1))
+	with rasterio.open(path, "w", **profile) as dst:
+		dst.write(img)
+
+	with rasterio.open(path) as src:
+		res = spatial.snitc(src, 16, 1, output="matrix", iter=20)
+		capsys.readouterr()
+		out = spatial.snitc(src, 16, 1, output="matrix", iter=20, tol=0)
+
+	assert "Iterations: 20 of 20" not in capsys.readouterr().out
+	assert (out == res).all()
+
+
+def test_snitc_lower_bound():
+	import numpy
+	from stmetrics import spatial
+
+	numpy.random.seed(0)
+	buffers = numpy.empty(21), numpy.empty(21)
+
+	for window, psi in [(None, None), (3, None), (None, 2), (1, None)]:
+		settings = spatial._dtw_settings(window=window, psi=psi)
+		for _ in range(20):
+			s1, s2 = numpy.random.rand(2, 20)
+			upper, lower = spatial._envelope(s2, settings[0])
+			bound = spatial._lower_bound(s1, s2, upper, lower, settings[4],
+			                             numpy.inf)
+			dtw = spatial._dtw(s1, s2, *settings, *buffers)
+			assert bound <= dtw ** 2 + 1e-12
+
+
+def test_snitc2raster(tmp_path):
+	import numpy
+	import rasterio
+	from rasterio.transform import from_origin
+	from stmetrics import spatial
+
+	numpy.random.seed(0)
+	img = numpy.random.rand(12, 50, 40) * 3000
+	img[:, :25] += 3000
+	img[:, :, :15] += 2000
+
+	path = str(tmp_path / "sits.tif")
+	profile = dict(driver="GTiff", count=12, height=50, width=40,
+	               dtype="float64", crs="EPSG:4326",
+	               transform=from_origin(-45, -10, 0.1, 0.1))
+	with rasterio.open(path, "w", **profile) as dst:
+		dst.write(img)
+
+	outputs = []
+	for num_cores in [1, 2]:
+		out_path = str(tmp_path / "labels_{}.tif".format(num_cores))
+		with rasterio.open(path) as src:
+			assert spatial.snitc2raster(src, out_path, 20, 1, tile_size=20,
+			                            num_cores=num_cores) == out_path
+
+		with rasterio.open(out_path) as dst:
+			assert dst.dtypes == ("int32",)
+			assert dst.transform == profile["transform"]
+			outputs.append(dst.read(1))
+
+	labels = numpy.unique(outputs[0])
+	assert (outputs[0] == outputs[1]).all()
+	assert list(labels) == list(range(len(labels)))
+
+	segmentation = spatial.snitc2raster(path, str(tmp_path / "l.tif"), 20, 1,
+	                                    tile_size=20, num_cores=1,
+	                                    output="shp")
+	assert sorted(segmentation["label"]) == list(labels)
+
+	# The thin strips left by a tile size that does not divide the scene \
+	# are merged in the previous tiles
+	path = str(tmp_path / "odd.tif")
+	profile.update(height=61, width=41)
+	with rasterio.open(path, "w", **profile) as dst:
+		dst.write(numpy.random.rand(12, 61, 41) * 3000)
+
+	for tile_size, overlap in [(20, None), (30, 0)]:
+		out_path = spatial.snitc2raster(path, str(tmp_path / "odd_l.tif"), 20,
+		                                1, tile_size=tile_size,
+		                                overlap=overlap, num_cores=1)
+		with rasterio.open(out_path) as dst:
+			assert dst.shape == (61, 41)
+			assert dst.read(1).min() == 0
+
+	assert spatial._tile_spans(61, 20, 24) == [(0, 20), (20, 20), (40, 21)]
+	assert spatial._tile_spans(61, 30, 24) == [(0, 30), (30, 31)]
+	assert spatial._cluster_groups(numpy.full((3, 14), numpy.nan), 12,
+	                               5) == []
+
+
 if __name__ == '__main__':
     pytest.main(['--color=auto', '--no-cov'])
\ No newline at end of file